@@ -0,0 +1,132 @@
+"""
+Recommendation throughput by inference mode, at several client concurrencies.
+
+    python -m benchmarks.bench_inference [--users 200000] [--items 50000] [--factors 64]
+                                         [--clients 1 8 32] [--requests 400] [--processes 2]
+
+    inline   _recommend on the event loop (the path before cache misses were offloaded)
+    thread   generate_recommendations, scoring in the inference threads
+    process  generate_recommendations, scoring in the process pool (services.ai_inference)
+
+Every request is a cache miss for a distinct child, the precomputed top-K table is
+off and no DB is involved: this measures model scoring + ranking only. The
+snapshot is built in memory from synthetic mmapped artifacts.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from services import ai_service
+from services.ai_artifacts import FactorModel, export_artifacts, load_artifacts
+from services.ai_cache import AISnapshot
+from services.ai_inference import InferencePool
+from services.ai_ranking import SpatialIndex
+from services.ai_store import ActivityStore, ChildStore
+
+
+def build_snapshot(base: str, users: int, items: int, factors: int, seed: int = 7) -> AISnapshot:
+    rng = np.random.default_rng(seed)
+    model = FactorModel(
+        rng.standard_normal((users, factors), dtype=np.float32),
+        rng.standard_normal((items, factors), dtype=np.float32),
+    )
+    child_encoder = {f"c-{i:08d}-0000-0000-0000-000000000000": i for i in range(users)}
+    activity_encoder = {f"a-{i:08d}-0000-0000-0000-000000000000": i for i in range(items)}
+    source = os.path.join(base, "artifacts")
+    export_artifacts(model, child_encoder, activity_encoder, source)
+    model, child_encoder, activity_encoder, _ = load_artifacts(source)
+
+    lat = 24.0 + rng.random(max(users, items))
+    lng = 46.0 + rng.random(max(users, items))
+    children = ChildStore.build(
+        ({"child_id": cid, "age": 8, "lat": lat[i], "lng": lng[i]} for cid, i in child_encoder.items()),
+        "child_id", child_encoder,
+    )
+    activities = ActivityStore.build(
+        ({"activity_id": aid, "activity_name": f"activity {i}", "category": "sport", "price": 10.0,
+          "min_age": 3, "max_age": 14, "activity_lat": lat[i], "activity_lng": lng[i]}
+         for aid, i in activity_encoder.items()),
+        "activity_id", activity_encoder,
+    )
+    return AISnapshot(
+        version=1,
+        refresh_version=1,
+        built_ts=time.time(),
+        model_source=source,
+        model=model,
+        child_encoder=child_encoder,
+        activity_encoder=activity_encoder,
+        matrix=csr_matrix((users, items), dtype=np.float32),
+        children=children,
+        activities=activities,
+        activity_index=SpatialIndex.build(activities),
+    )
+
+
+async def run_clients(mode: str, snap: AISnapshot, clients: int, requests: int, seed: int):
+    child_ids = list(snap.children.ids[np.random.default_rng(seed).integers(0, len(snap.children), requests)])
+    queue = iter(child_ids)
+    latencies = []
+
+    async def client():
+        for child_id in queue:
+            started = time.perf_counter()
+            if mode == "inline":
+                ai_service._recommend(snap, child_id, 10)
+                await asyncio.sleep(0)  # yield like a real handler would between requests
+            else:
+                await ai_service.generate_recommendations(child_id, 10)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    return requests / elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--items", type=int, default=50_000)
+    parser.add_argument("--factors", type=int, default=64)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--processes", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as base:
+        snap = build_snapshot(base, args.users, args.items, args.factors)
+        ai_service.STATE.snapshot = snap
+        ai_service.STATE.results.max_entries = 0  # every request computes
+        ai_service.INFERENCE_MAX_PENDING = 1 << 30  # measure queueing, not rejection
+
+        pool = InferencePool(args.processes)
+        pool.warm(snap.model_source)
+
+        print(f"users={args.users} items={args.items} factors={args.factors} cpus={os.cpu_count()} "
+              f"threads={ai_service.INFERENCE_THREADS} processes={args.processes}")
+        print(f"{'mode':>8} {'clients':>8} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+        try:
+            for mode in ("inline", "thread", "process"):
+                ai_service._INFERENCE_POOL = pool if mode == "process" else None
+                for clients in args.clients:
+                    asyncio.run(run_clients(mode, snap, clients, min(50, args.requests), seed=1))  # warm-up
+                    throughput, latencies = asyncio.run(run_clients(mode, snap, clients, args.requests, seed=2))
+                    p50 = statistics.median(latencies) * 1000
+                    p99 = float(np.quantile(latencies, 0.99)) * 1000
+                    print(f"{mode:>8} {clients:>8} {throughput:>9.1f} {p50:>8.2f} {p99:>8.2f}")
+        finally:
+            ai_service._INFERENCE_POOL = None
+            pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Quantized candidate generation (services/ai_quant.py) vs. exact float32 scoring.
+
+    python -m benchmarks.bench_quantized [--users 200000] [--items 50000 500000] [--factors 64]
+                                         [--k 10 50] [--oversample 1 4] [--requests 200]
+
+Per catalog size and mode it reports:
+    MB          size of the item factors (float32 rows: the unquantized model); users stay float32
+    build ms    quantizing the item factors in memory; "mmap" rows map codes exported with
+                export_artifacts(quantize=...) instead and report the load time
+    p50 / p99   single-user candidate latency, top max(--k) * 5 like _recommend asks for
+    overlap@K   |quantized top-K ∩ exact top-K| / K with top-K requested directly,
+                averaged over the sampled users (the candidate cut is K * oversample)
+
+The factors are synthetic, with a low-rank structure plus noise so that scores have
+realistic near-ties, not i.i.d. Gaussian. For real numbers, point --artifacts at an
+exported artifact directory (services.ai_artifacts).
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from services.ai_artifacts import FactorModel, export_artifacts, load_artifacts, load_quantized
+from services.ai_quant import QUANT_MODES, QuantizedModel
+
+
+def synthetic_model(users: int, items: int, factors: int, seed: int = 7) -> FactorModel:
+    rng = np.random.default_rng(seed)
+    rank = max(4, factors // 8)
+    basis = rng.standard_normal((rank, factors), dtype=np.float32)
+    user_factors = rng.standard_normal((users, rank), dtype=np.float32) @ basis
+    user_factors += 0.3 * rng.standard_normal((users, factors), dtype=np.float32)
+    item_factors = rng.standard_normal((items, rank), dtype=np.float32) @ basis
+    item_factors += 0.3 * rng.standard_normal((items, factors), dtype=np.float32)
+    scale = np.float32(1.0 / np.sqrt(factors))
+    return FactorModel(user_factors * scale, item_factors * scale)
+
+
+def exact_top(model: FactorModel, user_idx: int, n: int) -> np.ndarray:
+    scores = model.item_factors @ model.user_factors[user_idx]
+    part = np.argpartition(-scores, n - 1)[:n]
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+def measure(fn, users: np.ndarray):
+    fn(int(users[0]))  # warm-up
+    latencies = []
+    for user in users.tolist():
+        started = time.perf_counter()
+        fn(user)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def overlap(approx: np.ndarray, exact: np.ndarray, k: int) -> float:
+    return len(np.intersect1d(approx[:k], exact[:k])) / k
+
+
+def report(items, label, oversample, quantized, build_ms, users, n, exact, ks):
+    latencies = measure(lambda u: quantized.recommend_user(u, n), users)
+    overlaps = [
+        statistics.mean(
+            overlap(quantized.recommend_user(u, k)[0], e, k) for u, e in zip(users.tolist(), exact[k])
+        )
+        for k in ks
+    ]
+    print(f"{items:>8} {label:>13} {oversample:>5} {quantized.nbytes / 2**20:>8.1f} {build_ms:>9.1f} "
+          f"{statistics.median(latencies) * 1000:>8.2f} {np.quantile(latencies, 0.99) * 1000:>8.2f}  "
+          + " ".join(f"{o:>11.4f}" for o in overlaps))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--items", type=int, nargs="+", default=[50_000, 500_000])
+    parser.add_argument("--factors", type=int, default=64)
+    parser.add_argument("--k", type=int, nargs="+", default=[10, 50])
+    parser.add_argument("--oversample", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--artifacts", help="score an exported artifact dir instead of synthetic factors")
+    args = parser.parse_args()
+
+    n = max(50, max(args.k) * 5)  # what _recommend requests per child
+    print(f"factors={args.factors} n={n} requests={args.requests}")
+    print(f"{'items':>8} {'mode':>13} {'over':>5} {'MB':>8} {'build ms':>9} {'p50 ms':>8} {'p99 ms':>8}  "
+          + " ".join(f"{f'overlap@{k}':>11}" for k in args.k))
+
+    for items in ([None] if args.artifacts else args.items):
+        if args.artifacts:
+            model = load_artifacts(args.artifacts)[0]
+        else:
+            model = synthetic_model(args.users, items, args.factors)
+        items = model.item_factors.shape[0]
+        users = np.random.default_rng(1).integers(0, model.user_factors.shape[0], args.requests)
+
+        latencies = measure(lambda u: exact_top(model, u, n), users)
+        exact = {k: [exact_top(model, u, k) for u in users.tolist()] for k in args.k}
+        float32_mb = model.item_factors.nbytes / 2**20
+        print(f"{items:>8} {'float32':>13} {'-':>5} {float32_mb:>8.1f} {'-':>9} "
+              f"{statistics.median(latencies) * 1000:>8.2f} {np.quantile(latencies, 0.99) * 1000:>8.2f}  "
+              + " ".join(f"{1.0:>11.4f}" for _ in args.k))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            exported = os.path.join(tmp, "artifacts")
+            export_artifacts(model, {}, {}, exported, quantize=QUANT_MODES)
+            for mode in QUANT_MODES:
+                for oversample in args.oversample:
+                    for source in ("build", "mmap"):
+                        started = time.perf_counter()
+                        if source == "build":
+                            quantized = QuantizedModel.build(model, mode, oversample)
+                        else:
+                            quantized = QuantizedModel(model, load_quantized(exported, mode), oversample)
+                        build_ms = (time.perf_counter() - started) * 1000
+                        report(items, f"{mode}/{source}", oversample, quantized, build_ms, users, n, exact, args.k)
+
+
+if __name__ == "__main__":
+    main()
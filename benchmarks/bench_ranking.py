@@ -0,0 +1,130 @@
+"""
+Microbenchmark: per-candidate Python loop vs. vectorized ranking (services/ai_ranking.py).
+
+    python -m benchmarks.bench_ranking [--sizes 1000 10000 100000] [--repeat 20]
+
+Both sides score *every* candidate (age filter, haversine distance, response dict)
+and return the `limit` nearest, ties broken by higher score. The legacy loop is
+the pre-vectorization body of generate_recommendations/_fallback_recommendations.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import time
+
+import numpy as np
+
+from services.ai_ranking import age_mask, rank_by_distance, to_results
+from services.ai_service import calc_distance
+from services.ai_store import ActivityStore
+
+
+def make_catalog(n: int, seed: int = 7):
+    rnd = random.Random(seed)
+    meta = {}
+    for i in range(n):
+        lo = rnd.randint(3, 12)
+        meta[f"a{i}"] = {
+            "activity_name": f"Activity {i}",
+            "category": rnd.choice(["sport", "art", "science", "music"]),
+            "price": round(rnd.uniform(0, 500), 2),
+            "duration_hours": rnd.randint(1, 6),
+            "min_age": lo,
+            "max_age": lo + rnd.randint(1, 6),
+            "lat": 24.5 + rnd.uniform(-0.5, 0.5),
+            "lng": 46.7 + rnd.uniform(-0.5, 0.5),
+        }
+    scores = {aid: rnd.random() for aid in meta}
+    return meta, scores
+
+
+def legacy_rank(meta, scores, child_lat, child_lng, child_age, limit):
+    results = []
+    for aid, score in scores.items():
+        m = meta.get(aid)
+        if not m:
+            continue
+
+        min_age = m.get("min_age")
+        max_age = m.get("max_age")
+        if child_age is not None and min_age is not None and max_age is not None:
+            try:
+                if not (int(min_age) <= int(child_age) <= int(max_age)):
+                    continue
+            except Exception:
+                pass
+
+        dist = calc_distance(
+            child_lat, child_lng,
+            float(m.get("lat") or 0.0),
+            float(m.get("lng") or 0.0),
+        )
+        results.append({
+            "activity_id": aid,
+            "activity_name": m.get("activity_name"),
+            "score": float(score),
+            "distance_km": round(dist, 2),
+            "category": m.get("category"),
+            "price": float(m.get("price") or 0.0),
+            "duration_hours": int(m.get("duration_hours") or 0),
+            "min_age": int(m.get("min_age") or 0),
+            "max_age": int(m.get("max_age") or 99),
+            "lat": float(m.get("lat") or 0.0),
+            "lng": float(m.get("lng") or 0.0),
+            "source": "als"
+        })
+
+    results.sort(key=lambda x: (x["distance_km"], -x["score"]))
+    return results[:limit]
+
+
+def vector_rank(cols, rows, scores, child_lat, child_lng, child_age, limit):
+    keep = age_mask(cols, rows, child_age)
+    rows, scores, dist = rank_by_distance(cols, rows[keep], scores[keep], child_lat, child_lng, limit)
+    return to_results(cols, rows, scores, dist, "als")
+
+
+def _time(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    child_lat, child_lng, child_age = 24.7, 46.6, 8
+
+    print(f"{'activities':>10} {'loop ms':>10} {'vector ms':>10} {'speedup':>8}  same")
+    for n in args.sizes:
+        meta, scores = make_catalog(n)
+        encoder = {aid: i for i, aid in enumerate(meta)}
+        cols = ActivityStore.build(
+            ({"activity_id": aid, **m, "activity_lat": m["lat"], "activity_lng": m["lng"]} for aid, m in meta.items()),
+            "activity_id",
+            encoder,
+        )
+        rows = np.arange(n)
+        score_arr = np.array([scores[aid] for aid in cols.ids], dtype=np.float64)
+
+        expected = legacy_rank(meta, scores, child_lat, child_lng, child_age, args.limit)
+        got = vector_rank(cols, rows, score_arr, child_lat, child_lng, child_age, args.limit)
+        same = [r["activity_id"] for r in expected] == [r["activity_id"] for r in got]
+
+        repeat = max(3, args.repeat if n <= 10_000 else args.repeat // 4)
+        loop_ms = _time(lambda: legacy_rank(meta, scores, child_lat, child_lng, child_age, args.limit), repeat)
+        vec_ms = _time(lambda: vector_rank(cols, rows, score_arr, child_lat, child_lng, child_age, args.limit), repeat)
+        print(f"{n:>10} {loop_ms:>10.2f} {vec_ms:>10.3f} {loop_ms / vec_ms:>7.1f}x  {same}")
+
+
+if __name__ == "__main__":
+    main()
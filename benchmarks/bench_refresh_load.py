@@ -0,0 +1,141 @@
+"""
+Refresh load benchmark: bookings-shaped (child_id, activity_id, rating) rows from a
+real Postgres, read three ways and encoded into the refresh's index arrays.
+
+    DB_HOST=localhost DB_NAME=saifi_bench DB_USER=... DB_SSLMODE=disable \\
+        python -m benchmarks.bench_refresh_load [--rows 100000 1000000] [--repeat 3] [--keep]
+
+    fetchall  cursor.fetchall() + a dict per row (the pre-streaming fetch_all)
+    cursor    server-side cursor batches (SAIFI_AI_REFRESH_LOADER=cursor, the default)
+    copy      COPY ... TO STDOUT CSV parsed by np.loadtxt in batches (SAIFI_AI_REFRESH_LOADER=copy)
+
+Peak MB is Python-side allocation (tracemalloc) during one more, untimed load.
+
+Synthetic rows go into saifi_bench.interactions_<rows> (dropped afterwards unless
+--keep); ids are uuid::text like the live tables, ~10% of ratings are NULL.
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+import tracemalloc
+
+import numpy as np
+
+from db.connection import close_pool, db_connection, stream_query
+from services.ai_service import copy_interaction_batches, encode_interactions
+
+SCHEMA = "saifi_bench"
+
+
+def make_table(rows: int, children: int, activities: int) -> str:
+    table = f"{SCHEMA}.interactions_{rows}"
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}")
+        cur.execute(f"DROP TABLE IF EXISTS {table}")
+        cur.execute(f"""
+            CREATE TABLE {table} AS
+            SELECT
+                md5('c' || (i % {int(children)}))::uuid AS child_id,
+                md5('a' || ((i * 7919) % {int(activities)}))::uuid AS activity_id,
+                CASE WHEN i % 10 = 0 THEN NULL ELSE (1 + i % 5)::float END AS rating
+            FROM generate_series(1, {int(rows)}) AS i
+        """)
+        cur.execute(f"ANALYZE {table}")
+        conn.commit()
+        cur.close()
+    return table
+
+
+def drop_table(table: str) -> None:
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.commit()
+        cur.close()
+
+
+def encoders(table: str):
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"SELECT DISTINCT child_id::text FROM {table} ORDER BY 1")
+        child_encoder = {cid: i for i, (cid,) in enumerate(cur.fetchall())}
+        cur.execute(f"SELECT DISTINCT activity_id::text FROM {table} ORDER BY 1")
+        activity_encoder = {aid: i for i, (aid,) in enumerate(cur.fetchall())}
+        cur.close()
+    return child_encoder, activity_encoder
+
+
+def load_fetchall(query, child_encoder, activity_encoder):
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(query)
+        names = [desc[0] for desc in cur.description]
+        rows = [dict(zip(names, row)) for row in cur.fetchall()]
+        cur.close()
+    columns = {name: [r[name] for r in rows] for name in names}
+    return encode_interactions([columns], child_encoder, activity_encoder)
+
+
+def load_cursor(query, child_encoder, activity_encoder):
+    batches = (dict(zip(names, zip(*rows))) for names, rows in stream_query(query))
+    return encode_interactions(batches, child_encoder, activity_encoder)
+
+
+def load_copy(query, child_encoder, activity_encoder):
+    return encode_interactions(copy_interaction_batches(query), child_encoder, activity_encoder)
+
+
+LOADERS = {"fetchall": load_fetchall, "cursor": load_cursor, "copy": load_copy}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--children", type=int, default=50_000)
+    parser.add_argument("--activities", type=int, default=5_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--keep", action="store_true", help="keep the synthetic tables")
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'loader':>9} {'median ms':>10} {'min ms':>9} {'rows/s':>12} {'peak MB':>8}")
+    try:
+        for n in args.rows:
+            table = make_table(n, args.children, args.activities)
+            query = f"SELECT child_id::text AS child_id, activity_id::text AS activity_id, rating FROM {table}"
+            child_encoder, activity_encoder = encoders(table)
+
+            reference = None
+            for name, load in LOADERS.items():
+                times = []
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    result = load(query, child_encoder, activity_encoder)
+                    times.append((time.perf_counter() - started) * 1000)
+
+                # every loader must produce the same arrays (row order is the table's)
+                if reference is None:
+                    reference = result
+                else:
+                    for key in ("user_idx", "item_idx", "rating"):
+                        assert np.array_equal(result[key], reference[key], equal_nan=True), (name, key)
+
+                tracemalloc.start()
+                load(query, child_encoder, activity_encoder)
+                peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+                tracemalloc.stop()
+
+                median = statistics.median(times)
+                print(f"{n:>9} {name:>9} {median:>10.1f} {min(times):>9.1f} {n / (median / 1000):>12,.0f} "
+                      f"{peak_mb:>8.1f}")
+
+            if not args.keep:
+                drop_table(table)
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
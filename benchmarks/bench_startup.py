@@ -0,0 +1,126 @@
+"""
+Startup benchmark: pickled model + encoders vs. memory-mapped .npy artifacts
+(services/ai_artifacts.py), with N workers alive at once like uvicorn --workers N.
+
+    python -m benchmarks.bench_startup [--users 500000] [--items 50000] [--factors 64] [--workers 4]
+
+Each worker loads the assets, touches every factor page (one full scoring pass, as
+serving would), then reports its load time, RSS and PSS. PSS splits shared pages
+between the processes mapping them, so sum(PSS) is the real memory cost of N workers.
+Pickle load time includes importing implicit, which unpickling the model needs.
+"""
+from __future__ import annotations
+
+import argparse
+import multiprocessing as mp
+import os
+import pickle
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+
+def make_assets(out_dir: str, users: int, items: int, factors: int, seed: int = 7) -> None:
+    from implicit.cpu.als import AlternatingLeastSquares
+
+    from services.ai_artifacts import export_artifacts
+
+    rng = np.random.default_rng(seed)
+    model = AlternatingLeastSquares(factors=factors, random_state=seed)
+    model.user_factors = rng.standard_normal((users, factors), dtype=np.float32)
+    model.item_factors = rng.standard_normal((items, factors), dtype=np.float32)
+    child_encoder = {f"c-{i:08d}-0000-0000-0000-000000000000": i for i in range(users)}
+    activity_encoder = {f"a-{i:08d}-0000-0000-0000-000000000000": i for i in range(items)}
+
+    for name, obj in (("model.pkl", model), ("child_encoder.pkl", child_encoder),
+                      ("activity_encoder.pkl", activity_encoder)):
+        with open(os.path.join(out_dir, name), "wb") as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    export_artifacts(model, child_encoder, activity_encoder, os.path.join(out_dir, "artifacts"))
+
+
+def _memory_kb() -> tuple:
+    rss = pss = 0
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                rss = int(line.split()[1])
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    pss = int(line.split()[1])
+    except OSError:
+        pass
+    return rss, pss
+
+
+def _load(fmt: str, base: str):
+    if fmt == "pickle":
+        def load(name):
+            with open(os.path.join(base, name), "rb") as f:
+                return pickle.load(f)
+        return load("model.pkl"), load("child_encoder.pkl"), load("activity_encoder.pkl")
+
+    from services.ai_artifacts import load_artifacts
+    model, child_encoder, activity_encoder, _ = load_artifacts(os.path.join(base, "artifacts"))
+    return model, child_encoder, activity_encoder
+
+
+def _worker(fmt: str, base: str, barrier, results) -> None:
+    baseline_rss, baseline_pss = _memory_kb()
+    t0 = time.perf_counter()
+    model, child_encoder, activity_encoder = _load(fmt, base)
+    load_ms = (time.perf_counter() - t0) * 1000
+
+    # one scoring pass over all factors, so mmapped pages are actually resident
+    float(np.asarray(model.user_factors).sum() + np.asarray(model.item_factors).sum())
+    child_encoder.get(next(iter(child_encoder)))
+
+    barrier.wait()  # everyone loaded: PSS now reflects sharing
+    rss, pss = _memory_kb()
+    results.put((load_ms, rss - baseline_rss, pss - baseline_pss))
+    barrier.wait()  # stay mapped until all workers have measured
+
+
+def run(fmt: str, base: str, workers: int):
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(fmt, base, barrier, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    samples = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=500_000)
+    parser.add_argument("--items", type=int, default=50_000)
+    parser.add_argument("--factors", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as base:
+        make_assets(base, args.users, args.items, args.factors)
+        factor_mb = (args.users + args.items) * args.factors * 4 / 2**20
+        print(f"users={args.users} items={args.items} factors={args.factors} "
+              f"(factors {factor_mb:.0f} MB) workers={args.workers}")
+        print(f"{'format':>8} {'load ms':>10} {'RSS MB/worker':>14} {'PSS MB total':>13}")
+
+        for fmt in ("pickle", "mmap"):
+            samples = run(fmt, base, args.workers)
+            load_ms = statistics.median(s[0] for s in samples)
+            rss_mb = statistics.median(s[1] for s in samples) / 1024
+            pss_mb = sum(s[2] for s in samples) / 1024
+            print(f"{fmt:>8} {load_ms:>10.1f} {rss_mb:>14.1f} {pss_mb:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,30 @@
-import psycopg2
 import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import IO
 
-def get_connection():
-    return psycopg2.connect(
+import psycopg2
+from psycopg2 import pool as pg_pool
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, encodings as pg_encodings
+
+# ====== Pool config ======
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+# how long a request may wait for a free connection before failing
+POOL_CHECKOUT_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_CHECKOUT_TIMEOUT_SECONDS", "10"))
+# connections idle longer than this are pinged (SELECT 1) before being handed out
+POOL_HEALTHCHECK_IDLE_SECONDS = float(os.getenv("DB_POOL_HEALTHCHECK_IDLE_SECONDS", "30"))
+# rows per round trip for server-side (named) cursors, see stream_query
+STREAM_ITERSIZE = int(os.getenv("DB_STREAM_ITERSIZE", "5000"))
+# COPY output kept in memory up to this size, spooled to a temp file beyond it (see copy_query)
+COPY_SPOOL_BYTES = int(os.getenv("DB_COPY_SPOOL_BYTES", str(8 << 20)))
+
+
+def _connect_kwargs():
+    return dict(
         host=os.getenv("DB_HOST"),
         port=os.getenv("DB_PORT", 5432),
         database=os.getenv("DB_NAME"),
@@ -11,3 +33,244 @@ def get_connection():
         sslmode=os.getenv("DB_SSLMODE", "require"),
         connect_timeout=10
     )
+
+
+def get_connection():
+    """Opens a dedicated (unpooled) connection. Prefer `db_connection()`."""
+    return psycopg2.connect(**_connect_kwargs())
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool on top of psycopg2's ThreadedConnectionPool.
+
+    psycopg2's pool raises as soon as it is exhausted; this one blocks (up to
+    POOL_CHECKOUT_TIMEOUT_SECONDS) so it behaves well behind uvicorn's threadpool,
+    pings connections that sat idle for a while, and keeps wait/utilization stats.
+    """
+
+    def __init__(self, minconn: int, maxconn: int, **connect_kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self._pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, **connect_kwargs)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._last_used = {}  # id(conn) -> monotonic ts when returned to the pool
+
+        # ====== Stats ======
+        # connections parked in psycopg2's pool: it opens minconn up front, hands
+        # those out first and keeps a returned one only while fewer than minconn are parked
+        self.idle = minconn
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.healthcheck_failures = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+
+        idle_since = self._last_used.get(id(conn))
+        if idle_since is None or time.monotonic() - idle_since < POOL_HEALTHCHECK_IDLE_SECONDS:
+            return True
+
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _checkout(self):
+        conn = self._pool.getconn()
+        with self._lock:
+            self.idle = max(self.idle - 1, 0)
+        return conn
+
+    def getconn(self, timeout: float = POOL_CHECKOUT_TIMEOUT_SECONDS):
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise PoolTimeout(f"No database connection available after {timeout:.1f}s")
+
+        try:
+            conn = self._checkout()
+            while not self._is_healthy(conn):
+                with self._lock:
+                    self.healthcheck_failures += 1
+                self._last_used.pop(id(conn), None)
+                self._pool.putconn(conn, close=True)
+                conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+
+        waited = time.monotonic() - started
+        with self._lock:
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            self.checkouts += 1
+            self.wait_time_total += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+        return conn
+
+    def putconn(self, conn, close: bool = False) -> None:
+        try:
+            if not close and not conn.closed and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                # never hand a half-finished transaction to the next caller
+                conn.rollback()
+        except Exception:
+            close = True
+
+        if close or conn.closed:
+            self._last_used.pop(id(conn), None)
+        else:
+            self._last_used[id(conn)] = time.monotonic()
+
+        close = close or bool(conn.closed)
+        try:
+            self._pool.putconn(conn, close=close)
+        finally:
+            with self._lock:
+                self.in_use -= 1
+                if not close and self.idle < self.minconn:
+                    self.idle += 1
+            self._slots.release()
+
+    def closeall(self) -> None:
+        self._pool.closeall()
+        self._last_used.clear()
+        with self._lock:
+            self.idle = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            checkouts = self.checkouts
+            return {
+                "min_size": self.minconn,
+                "max_size": self.maxconn,
+                "in_use": self.in_use,
+                "idle": self.idle,
+                "peak_in_use": self.peak_in_use,
+                "utilization": round(self.in_use / self.maxconn, 3),
+                "checkouts": checkouts,
+                "timeouts": self.timeouts,
+                "healthcheck_failures": self.healthcheck_failures,
+                "wait_ms_avg": round(1000 * self.wait_time_total / checkouts, 3) if checkouts else 0.0,
+                "wait_ms_max": round(1000 * self.wait_time_max, 3),
+            }
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = ConnectionPool(POOL_MIN_SIZE, POOL_MAX_SIZE, **_connect_kwargs())
+    return _POOL
+
+
+def close_pool() -> None:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.closeall()
+            _POOL = None
+
+
+def pool_stats() -> dict:
+    if _POOL is None:
+        return {"initialized": False}
+    return {"initialized": True, **_POOL.stats()}
+
+
+@contextmanager
+def db_connection():
+    """
+    Borrow a pooled connection:
+
+        with db_connection() as conn:
+            cur = conn.cursor()
+            ...
+            conn.commit()
+
+    Uncommitted work is rolled back when the block exits; a connection that
+    broke mid-use is discarded instead of going back to the pool.
+    """
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        pool.putconn(conn, close=True)
+        raise
+    except BaseException:
+        # includes GeneratorExit from a stream_query consumer that stopped early
+        pool.putconn(conn)
+        raise
+    else:
+        pool.putconn(conn)
+
+
+def stream_query(query, params=None, itersize: int = STREAM_ITERSIZE):
+    """
+    Yields (column names, rows) batches of up to `itersize` rows from a named
+    server-side cursor, so the full result never sits in client memory:
+
+        for names, rows in stream_query("SELECT ..."):
+            ...
+
+    The pooled connection is held until the generator is exhausted or closed.
+    """
+    with db_connection() as conn:
+        cur = conn.cursor(name=f"stream_{uuid.uuid4().hex}")
+        cur.itersize = itersize
+        try:
+            cur.execute(query, params)
+            rows = cur.fetchmany(itersize)
+            # a named cursor only has a description after the first fetch
+            names = [desc[0] for desc in cur.description] if cur.description else []
+            while rows:
+                yield names, rows
+                rows = cur.fetchmany(itersize)
+        finally:
+            cur.close()
+
+
+def copy_query(query, params=None, options: str = "FORMAT csv", spool_bytes: int = COPY_SPOOL_BYTES) -> IO[bytes]:
+    """
+    Runs `COPY (query) TO STDOUT WITH (options)` and returns the output in a
+    rewound spooled temp file. It stays in memory up to `spool_bytes` and moves
+    to disk beyond that, so a large result never sits in client memory; read it
+    line by line and close it when done. Much cheaper than a cursor for wide
+    scans: rows arrive as one byte stream instead of being decoded into Python
+    tuples.
+    """
+    buf = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+    try:
+        with db_connection() as conn:
+            cur = conn.cursor()
+            try:
+                sql = cur.mogrify(query, params).decode(pg_encodings[conn.encoding]) if params else query
+                cur.copy_expert(f"COPY ({sql}) TO STDOUT WITH ({options})", buf)
+            finally:
+                cur.close()
+    except BaseException:
+        buf.close()
+        raise
+    buf.seek(0)
+    return buf
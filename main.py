@@ -1,4 +1,8 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from routes import chatbot
 
@@ -10,29 +14,59 @@ from routes.bookings import router as bookings_router
 from routes.ai_router import router as ai_router
 from routes.feedback_router import router as feedback_router
 
-from services.ai_service import load_assets_once, refresh_ai_cache
+from services.ai_service import (
+    refresh_ai_cache,
+    request_refresh,
+    restore_snapshot,
+    run_refresh_loop,
+    start_inference_pool,
+    stop_inference_pool,
+)
 from services.ai_cache import STATE
+from db.connection import close_pool, pool_stats
+from utils import thread_budget
+from utils.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY as METRICS
 
 
 # =========================
-# APP INIT
+# LIFESPAN (startup / shutdown)
 # =========================
-app = FastAPI(
-    title="Saifi Backend",
-    version="1.0.0",
-    description="Backend API for Saifi Platform"
-)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # BLAS/OpenMP threads per worker: small for request scoring, raised only for refresh jobs
+    thread_budget.apply_request_budget()
 
-# =========================
-# STARTUP EVENTS
-# =========================
-@app.on_event("startup")
-async def startup():
+    # first snapshot before taking traffic; after that the background task keeps it fresh.
+    # a snapshot saved by an earlier refresh serves right away and is refreshed in the background
     try:
-        await refresh_ai_cache(force=True)
+        if await restore_snapshot():
+            request_refresh()
+        else:
+            await refresh_ai_cache(force=True)
     except Exception as e:
         print("AI cache skipped:", e)
+    await start_inference_pool()
 
+    refresher = asyncio.create_task(run_refresh_loop())
+    try:
+        yield
+    finally:
+        refresher.cancel()
+        with suppress(asyncio.CancelledError):
+            await refresher
+        stop_inference_pool()
+        close_pool()
+
+
+# =========================
+# APP INIT
+# =========================
+app = FastAPI(
+    title="Saifi Backend",
+    version="1.0.0",
+    description="Backend API for Saifi Platform",
+    lifespan=lifespan
+)
 
 
 # =========================
@@ -77,5 +111,16 @@ def health():
         "status": "healthy",
         "service": "saifi-backend",
         "ai_model_loaded": STATE.model is not None,
-        "ai_matrix_loaded": STATE.matrix is not None
+        "ai_model_version": STATE.snapshot.model_version,
+        "ai_matrix_loaded": STATE.matrix is not None,
+        "db_pool": pool_stats(),
+        "thread_budget": thread_budget.report()
     }
+
+
+# =========================
+# METRICS (Prometheus text format, this worker only)
+# =========================
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(METRICS.render(), media_type=METRICS_CONTENT_TYPE)
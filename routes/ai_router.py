@@ -1,23 +1,150 @@
-from fastapi import APIRouter
-from services.ai_service import generate_recommendations
+import hmac
+import os
+from typing import Optional
+
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from starlette.concurrency import run_in_threadpool
+from schemas.ai_schema import RecommendBatchRequest
+from services.ai_artifacts import version_dir
+from services.ai_service import (
+    AIOverloaded,
+    generate_recommendations,
+    generate_recommendations_batch,
+    similar_activities,
+    start_model_reload,
+)
 from services.ai_cache import STATE
+from services.child_service import ChildService
 
 router = APIRouter(prefix="/ai", tags=["AI"])
 
+# shared secret for /ai/admin/*; admin endpoints are disabled while unset
+ADMIN_TOKEN = os.getenv("SAIFI_ADMIN_TOKEN", "")
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=503, detail="Admin endpoints are disabled")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+def _overloaded(e: AIOverloaded) -> HTTPException:
+    # fail fast instead of queueing: the client (or LB) retries elsewhere/later
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
 
 @router.get("/recommend")
 async def recommend(child_id: str, limit: int = 10):
-    data = await generate_recommendations(child_id, limit)
+    try:
+        data = await generate_recommendations(child_id, limit)
+    except AIOverloaded as e:
+        raise _overloaded(e)
     return {
         "child_id": child_id,
         "recommendations": data
     }
 
 
+@router.get("/recommend/parent/{parent_id}")
+async def recommend_for_parent(parent_id: UUID, limit: int = 10):
+    # every child of the parent in one batched call (home screen)
+    children = await run_in_threadpool(ChildService.get_children_by_parent, str(parent_id))
+    child_ids = [str(c["child_id"]) for c in children]
+    try:
+        data = await generate_recommendations_batch(child_ids, limit)
+    except AIOverloaded as e:
+        raise _overloaded(e)
+    return {
+        "parent_id": str(parent_id),
+        "children": [
+            {"child_id": cid, "recommendations": data[cid]}
+            for cid in child_ids
+        ]
+    }
+
+
+@router.post("/recommend/batch")
+async def recommend_batch(body: RecommendBatchRequest):
+    try:
+        data = await generate_recommendations_batch(body.child_ids, body.limit)
+    except AIOverloaded as e:
+        raise _overloaded(e)
+    return {
+        "children": [
+            {"child_id": cid, "recommendations": recs}
+            for cid, recs in data.items()
+        ]
+    }
+
+
+@router.get("/similar/{activity_id}")
+async def similar(activity_id: str, limit: int = 10, age: Optional[float] = None, child_id: Optional[str] = None):
+    # table lookup only: no threadpool hop, no model call
+    data = similar_activities(activity_id, limit, age=age, child_id=child_id)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Activity not found")
+    return {
+        "activity_id": activity_id,
+        "similar": data
+    }
+
+
 @router.get("/health")
 def ai_health():
+    snap = STATE.snapshot
+    return {
+        "model_loaded": snap.model is not None,
+        "model_version": snap.model_version,
+        "model_load_ms": STATE.assets.load_ms if STATE.assets is not None else None,
+        "quantized_factors": snap.quantized.report() if snap.quantized is not None else None,
+        "model_reload": STATE.last_reload,
+        "matrix_loaded": snap.matrix is not None,
+        "snapshot_version": snap.version,
+        "snapshot_age_seconds": STATE.snapshot_age_seconds(),
+        "snapshot_restored_from": snap.restored_from,
+        "pending_interactions": len(STATE.pending),
+        "result_cache": STATE.results.stats(),
+        "fold_in": STATE.fold_in.stats(),
+        "store_memory_bytes": snap.store_memory_bytes
+    }
+
+
+@router.get("/memory")
+def ai_memory():
+    # per-column footprint of this worker's metadata store
+    snap = STATE.snapshot
     return {
-        "model_loaded": STATE.model is not None,
-        "matrix_loaded": STATE.matrix is not None
+        "snapshot_version": snap.version,
+        "store": snap.memory_report(),
+        "matrix_bytes": (
+            snap.matrix.data.nbytes + snap.matrix.indices.nbytes + snap.matrix.indptr.nbytes
+            if snap.matrix is not None else 0
+        )
     }
 
+
+
+@router.post("/admin/reload", status_code=202, dependencies=[Depends(require_admin)])
+async def admin_reload(version: Optional[str] = None):
+    """
+    Loads a registry version (default: LATEST) in the background and swaps it in.
+    Affects this worker only; repoint the registry's LATEST to roll every worker.
+    """
+    if version is not None:
+        try:
+            path = version_dir(version)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not os.path.isdir(path):
+            raise HTTPException(status_code=404, detail="Model version not found")
+
+    if not start_model_reload(version):
+        raise HTTPException(status_code=409, detail="A model reload is already running")
+    return {
+        "status": "reloading",
+        "requested": version or "latest",
+        "active_version": STATE.snapshot.model_version
+    }
@@ -0,0 +1,7 @@
+from pydantic import BaseModel, Field
+from typing import List
+
+
+class RecommendBatchRequest(BaseModel):
+    child_ids: List[str] = Field(..., min_length=1, max_length=50)
+    limit: int = 10
@@ -0,0 +1,361 @@
+# services/ai_artifacts.py
+"""
+Non-pickle model artifacts: ALS factors as .npy files plus encoders as sorted
+key/value arrays, all loadable with mmap_mode="r". Every uvicorn worker that maps
+the same directory shares one page-cache copy instead of unpickling its own.
+
+    python -m services.ai_artifacts export --out artifacts/current [--quantize int8]
+    python -m services.ai_artifacts inspect artifacts/current
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.ai_quant import QUANT_MODES, QuantizedFactors
+
+ARTIFACT_FORMAT = "saifi-als-npy/1"
+MANIFEST_FILE = "manifest.json"
+
+# versioned artifact sets: <registry>/<version>/ plus a LATEST file naming the active one
+REGISTRY_DIR = os.getenv("SAIFI_MODEL_REGISTRY", "model_registry")
+LATEST_FILE = "LATEST"
+
+
+# =========================
+# Encoder backed by sorted arrays
+# =========================
+class SortedEncoder(Mapping):
+    """
+    Read-only str -> int mapping over two aligned arrays (keys sorted).
+    Lookups are a binary search; `lookup` does it for a whole array at once.
+    """
+
+    def __init__(self, keys: np.ndarray, values: np.ndarray):
+        self.keys_array = keys
+        self.values_array = values
+
+    @classmethod
+    def from_dict(cls, encoder: Mapping[str, int]) -> "SortedEncoder":
+        items = sorted((str(k), int(v)) for k, v in encoder.items())
+        keys = np.array([k for k, _ in items], dtype=str) if items else np.array([], dtype="U1")
+        values = np.array([v for _, v in items], dtype=np.int32)
+        return cls(keys, values)
+
+    def _find(self, key: Any) -> int:
+        if not isinstance(key, str):
+            return -1
+        pos = int(np.searchsorted(self.keys_array, key))
+        if pos < len(self.keys_array) and self.keys_array[pos] == key:
+            return pos
+        return -1
+
+    def __getitem__(self, key: str) -> int:
+        pos = self._find(key)
+        if pos < 0:
+            raise KeyError(key)
+        return int(self.values_array[pos])
+
+    def get(self, key: str, default: Optional[int] = None) -> Optional[int]:
+        pos = self._find(key)
+        return int(self.values_array[pos]) if pos >= 0 else default
+
+    def __contains__(self, key: object) -> bool:
+        return self._find(key) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        return (str(k) for k in self.keys_array)
+
+    def __len__(self) -> int:
+        return len(self.keys_array)
+
+    def items(self):
+        return zip(self, self.values_array.tolist())
+
+    def values(self):
+        return self.values_array.tolist()
+
+    def lookup(self, keys: np.ndarray) -> np.ndarray:
+        """Vectorized get(): encoder index per key, -1 where unknown."""
+        keys = np.asarray(keys, dtype=self.keys_array.dtype if len(self.keys_array) else str)
+        if not len(self.keys_array):
+            return np.full(len(keys), -1, dtype=np.int32)
+        pos = np.searchsorted(self.keys_array, keys)
+        pos = np.minimum(pos, len(self.keys_array) - 1)
+        found = self.keys_array[pos] == keys
+        return np.where(found, self.values_array[pos], -1).astype(np.int32)
+
+
+# =========================
+# Factor-only ALS scorer
+# =========================
+class FactorModel:
+    """
+    The slice of implicit's ALS API the service uses (user_factors, item_factors,
+    recommend), over plain (possibly memory-mapped) float32 arrays.
+    """
+
+    def __init__(self, user_factors: np.ndarray, item_factors: np.ndarray, regularization: float = 0.01):
+        self.user_factors = user_factors
+        self.item_factors = item_factors
+        self.regularization = regularization
+
+    @property
+    def factors(self) -> int:
+        return self.item_factors.shape[1]
+
+    def recommend(
+        self,
+        userid,
+        user_items=None,
+        N: int = 10,
+        filter_already_liked_items: bool = True,
+        **_ignored,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        single = np.isscalar(userid)
+        users = np.atleast_1d(np.asarray(userid))
+        scores = self.user_factors[users] @ self.item_factors.T
+
+        if filter_already_liked_items and user_items is not None:
+            liked = user_items.tocsr() if hasattr(user_items, "tocsr") else user_items
+            for row in range(len(users)):
+                start, end = liked.indptr[row], liked.indptr[row + 1]
+                scores[row, liked.indices[start:end]] = -np.inf
+
+        n = min(N, scores.shape[1])
+        if n < scores.shape[1]:
+            part = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+        else:
+            part = np.tile(np.arange(scores.shape[1]), (len(users), 1))
+        part_scores = np.take_along_axis(scores, part, axis=1)
+        order = np.argsort(-part_scores, axis=1, kind="stable")
+        ids = np.take_along_axis(part, order, axis=1).astype(np.int32)
+        top = np.take_along_axis(part_scores, order, axis=1).astype(np.float32)
+
+        if single:
+            return ids[0], top[0]
+        return ids, top
+
+
+# =========================
+# Export / load
+# =========================
+def _write_npy(path: str, arr: np.ndarray) -> None:
+    np.save(path, np.ascontiguousarray(arr), allow_pickle=False)
+
+
+def _quantized_files(mode: str) -> Tuple[str, str]:
+    return f"item_codes_{mode}.npy", f"item_scales_{mode}.npy"
+
+
+def export_artifacts(
+    model: Any,
+    child_encoder: Mapping[str, int],
+    activity_encoder: Mapping[str, int],
+    out_dir: str,
+    extra_manifest: Optional[Dict[str, Any]] = None,
+    quantize: Sequence[str] = (),
+) -> Dict[str, Any]:
+    """
+    Writes the artifact set into a new hidden sibling directory and points out_dir
+    (a symlink) at it, so a worker opening out_dir sees the old set or the new one
+    (see _swap_in). `model` is anything with user_factors / item_factors (implicit ALS, FactorModel).
+    `quantize` adds quantized item codes per mode (services.ai_quant) for load_quantized.
+    """
+    for mode in quantize:
+        if mode not in QUANT_MODES:
+            raise ValueError(f"Unsupported quantization mode: {mode!r} (expected one of {QUANT_MODES})")
+    user_factors = np.asarray(model.user_factors, dtype=np.float32)
+    item_factors = np.asarray(model.item_factors, dtype=np.float32)
+    children = SortedEncoder.from_dict(child_encoder)
+    activities = SortedEncoder.from_dict(activity_encoder)
+
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=f".{os.path.basename(os.path.abspath(out_dir))}-", dir=parent)
+    os.chmod(tmp_dir, 0o755)  # mkdtemp is owner-only; workers may run as another user
+
+    _write_npy(os.path.join(tmp_dir, "user_factors.npy"), user_factors)
+    _write_npy(os.path.join(tmp_dir, "item_factors.npy"), item_factors)
+    _write_npy(os.path.join(tmp_dir, "child_keys.npy"), children.keys_array)
+    _write_npy(os.path.join(tmp_dir, "child_values.npy"), children.values_array)
+    _write_npy(os.path.join(tmp_dir, "activity_keys.npy"), activities.keys_array)
+    _write_npy(os.path.join(tmp_dir, "activity_values.npy"), activities.values_array)
+    for mode in quantize:
+        codes = QuantizedFactors.build(item_factors, mode)
+        codes_file, scales_file = _quantized_files(mode)
+        _write_npy(os.path.join(tmp_dir, codes_file), codes.codes)
+        if codes.scales is not None:
+            _write_npy(os.path.join(tmp_dir, scales_file), codes.scales)
+
+    manifest = {
+        "format": ARTIFACT_FORMAT,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "users": int(user_factors.shape[0]),
+        "items": int(item_factors.shape[0]),
+        "factors": int(item_factors.shape[1]),
+        "regularization": float(getattr(model, "regularization", 0.01)),
+        "quantized": sorted(set(quantize)),
+        **(extra_manifest or {}),
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    _swap_in(tmp_dir, out_dir)
+    return manifest
+
+
+def _swap_in(new_dir: str, out_dir: str) -> None:
+    """
+    Repoints the out_dir symlink at new_dir with one rename, then deletes the old
+    target (mapped files stay readable for the workers that have them open). A
+    plain directory left by an older export is renamed aside first; out_dir is
+    missing only between those two renames.
+    """
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    old_dir = None
+    if os.path.islink(out_dir):
+        old_dir = os.path.join(parent, os.readlink(out_dir))
+    elif os.path.exists(out_dir):
+        old_dir = tempfile.mkdtemp(prefix=".artifact-old-", dir=parent)
+        os.replace(out_dir, old_dir)
+
+    link = os.path.join(parent, f".{os.path.basename(new_dir)}.link")
+    os.symlink(os.path.basename(new_dir), link)
+    os.replace(link, out_dir)
+    if old_dir is not None and os.path.realpath(old_dir) != os.path.realpath(new_dir):
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def read_manifest(artifact_dir: str) -> Dict[str, Any]:
+    with open(os.path.join(artifact_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(f"Unsupported artifact format: {manifest.get('format')!r}")
+    return manifest
+
+
+def load_artifacts(
+    artifact_dir: str,
+    mmap: bool = True,
+) -> Tuple[FactorModel, SortedEncoder, SortedEncoder, Dict[str, Any]]:
+    """Maps an exported artifact set read-only (mmap=False reads it into memory)."""
+    manifest = read_manifest(artifact_dir)
+    mode = "r" if mmap else None
+
+    def load(name: str) -> np.ndarray:
+        return np.load(os.path.join(artifact_dir, name), mmap_mode=mode, allow_pickle=False)
+
+    model = FactorModel(
+        load("user_factors.npy"),
+        load("item_factors.npy"),
+        regularization=manifest.get("regularization", 0.01),
+    )
+    child_encoder = SortedEncoder(load("child_keys.npy"), load("child_values.npy"))
+    activity_encoder = SortedEncoder(load("activity_keys.npy"), load("activity_values.npy"))
+    return model, child_encoder, activity_encoder, manifest
+
+
+def load_quantized(artifact_dir: str, mode: str, mmap: bool = True) -> Optional[QuantizedFactors]:
+    """The item codes exported for `mode`, mapped like the factors; None if not exported."""
+    if mode not in read_manifest(artifact_dir).get("quantized", ()):
+        return None
+    mmap_mode = "r" if mmap else None
+    codes_file, scales_file = _quantized_files(mode)
+    codes = np.load(os.path.join(artifact_dir, codes_file), mmap_mode=mmap_mode, allow_pickle=False)
+    scales = None
+    if mode == "int8":
+        scales = np.load(os.path.join(artifact_dir, scales_file), mmap_mode=mmap_mode, allow_pickle=False)
+    return QuantizedFactors(codes, scales)
+
+
+# =========================
+# Model registry
+# =========================
+def version_dir(version: str, registry: str = REGISTRY_DIR) -> str:
+    if not version or version != os.path.basename(version) or version.startswith("."):
+        raise ValueError(f"Invalid model version: {version!r}")
+    return os.path.join(registry, version)
+
+
+def list_versions(registry: str = REGISTRY_DIR) -> List[str]:
+    if not os.path.isdir(registry):
+        return []
+    return sorted(
+        name for name in os.listdir(registry)
+        if not name.startswith(".") and os.path.isfile(os.path.join(registry, name, MANIFEST_FILE))
+    )
+
+
+def latest_version(registry: str = REGISTRY_DIR) -> Optional[str]:
+    try:
+        with open(os.path.join(registry, LATEST_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def set_latest(version: str, registry: str = REGISTRY_DIR) -> None:
+    version_dir(version, registry)  # validates the name
+    tmp = os.path.join(registry, f".{LATEST_FILE}.tmp")
+    with open(tmp, "w") as f:
+        f.write(version + "\n")
+    os.replace(tmp, os.path.join(registry, LATEST_FILE))
+
+
+# =========================
+# CLI
+# =========================
+def _load_pickle(path: str) -> Any:
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m services.ai_artifacts")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="convert the pickled model + encoders")
+    export.add_argument("--model", default=os.getenv("SAIFI_MODEL_PATH", "saifi_model.pkl"))
+    export.add_argument("--child-encoder", default=os.getenv("SAIFI_CHILD_ENCODER_PATH", "child_encoder.pkl"))
+    export.add_argument("--activity-encoder", default=os.getenv("SAIFI_ACTIVITY_ENCODER_PATH", "activity_encoder.pkl"))
+    export.add_argument("--out", required=True)
+    export.add_argument("--quantize", nargs="*", default=[], choices=QUANT_MODES,
+                        help="also export quantized item codes for these modes")
+
+    inspect = sub.add_parser("inspect", help="print an artifact manifest")
+    inspect.add_argument("artifact_dir")
+
+    versions = sub.add_parser("versions", help="list registry versions")
+    versions.add_argument("--registry", default=REGISTRY_DIR)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        manifest = export_artifacts(
+            _load_pickle(args.model),
+            _load_pickle(args.child_encoder),
+            _load_pickle(args.activity_encoder),
+            args.out,
+            quantize=args.quantize,
+        )
+    elif args.command == "versions":
+        latest = latest_version(args.registry)
+        for version in list_versions(args.registry):
+            print(version, "(latest)" if version == latest else "")
+        return
+    else:
+        manifest = read_manifest(args.artifact_dir)
+    print(json.dumps(manifest, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,33 +2,354 @@
 from __future__ import annotations
 
 import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass, field
-from typing import Any, Dict, Optional, List
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
 
+import numpy as np
 from scipy.sparse import csr_matrix
 
+from services.ai_ranking import SpatialIndex
+from services.ai_store import ActivityStore, ChildStore
+
+
+@dataclass(frozen=True)
+class ModelAssets:
+    """One loaded model version: factors + the encoders it was trained with."""
+    model: Any
+    child_encoder: Dict[str, int]
+    activity_encoder: Dict[str, int]
+    version: Optional[str] = None  # registry version / manifest version; None for legacy pickles
+    source: str = ""
+    # quantized factors for candidate generation (SAIFI_AI_QUANTIZE); None = float32 scoring
+    quantized: Optional[Any] = None
+    load_ms: float = 0.0
+    loaded_ts: float = 0.0
+
+
+@dataclass(frozen=True)
+class AISnapshot:
+    """
+    Everything a recommendation reads, built together by one refresh.
+
+    Published with a single reference swap (`AIState.publish`) and never
+    mutated afterwards, so a reader that pins `STATE.snapshot` once sees a
+    consistent model/encoders/matrix/metadata set for the whole request.
+    """
+    version: int = 0
+    # bumped by full refreshes only (delta merges keep it); keys the result cache
+    refresh_version: int = 0
+    built_ts: float = 0.0
+    # .npz this snapshot was restored from at startup (ai_persist); None when built from the DB
+    restored_from: Optional[str] = None
 
-@dataclass
-class AIState:
     # ====== Model & Encoders ======
+    model_version: Optional[str] = None
+    model_source: Optional[str] = None  # artifact dir / pickle path the model was loaded from
     model: Optional[Any] = None
+    quantized: Optional[Any] = None  # ai_quant.QuantizedModel of `model`, when enabled
     child_encoder: Optional[Dict[str, int]] = None
     activity_encoder: Optional[Dict[str, int]] = None
-    reverse_activity_map: Optional[Dict[int, str]] = None  # ALS idx -> activity_id (UUID str)
 
     # ====== CF Matrix ======
     matrix: Optional[csr_matrix] = None
 
-    # ====== Metadata Caches ======
-    child_meta: Dict[str, Dict[str, Any]] = field(default_factory=dict)
-    activity_meta: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # ====== Metadata (columnar, row == ALS index) ======
+    children: Optional[ChildStore] = None
+    activities: Optional[ActivityStore] = None
+    # memory_report() totals per store, computed once where the stores are built
+    # (off the event loop): the report walks every object column
+    store_memory_bytes: Dict[str, int] = field(default_factory=dict)
 
     # ====== Fallback Helpers ======
-    popular_activity_ids: List[str] = field(default_factory=list)
+    popularity: Dict[str, Tuple[float, int]] = field(default_factory=dict)  # activity_id -> (sum_rating, count)
+    popular_activity_ids: Tuple[str, ...] = ()
+    popular_rows: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    # popularity position per activity row (len(popular_rows) = not popular); fallback tie-break
+    popularity_rank: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+
+    # ====== Nearest-activity lookups ======
+    activity_index: Optional[SpatialIndex] = None
+
+    # ====== Precomputed ALS top-K (row == child ALS idx) ======
+    top_k_items: Optional[np.ndarray] = None   # int32 [children, K], -1 padded
+    top_k_scores: Optional[np.ndarray] = None  # float32 [children, K]
+
+    # ====== Fold-in (children the model has no factors for) ======
+    # child_id -> (activity ALS idx, confidence) for children missing from child_encoder
+    cold_interactions: Dict[str, Tuple[np.ndarray, np.ndarray]] = field(default_factory=dict)
+    item_gram: Optional[np.ndarray] = None  # YtY of the model's item factors
+
+    # ====== Item-item neighbors (row == activity ALS idx), cosine on item factors ======
+    item_neighbors: Optional[np.ndarray] = None        # int32 [activities, K], -1 padded
+    item_neighbor_scores: Optional[np.ndarray] = None  # float32 [activities, K]
+
+    def memory_report(self) -> Dict[str, Any]:
+        return {
+            "children": self.children.memory_report() if self.children is not None else None,
+            "activities": self.activities.memory_report() if self.activities is not None else None,
+        }
+
+
+def store_memory_totals(children: Optional[ChildStore], activities: Optional[ActivityStore]) -> Dict[str, int]:
+    """AISnapshot.store_memory_bytes for these stores."""
+    return {
+        name: store.memory_report()["total"] if store is not None else 0
+        for name, store in (("children", children), ("activities", activities))
+    }
+
+class InteractionDelta:
+    """
+    (child_id, activity_id) pairs whose bookings/feedback changed since the
+    published snapshot.
+
+    Filled from the (threadpool) write paths, drained by
+    ai_service.merge_pending_interactions, which re-reads just these pairs and
+    replaces their cells. Only the keys are buffered, so a pair that is merged
+    twice (or also read by a full refresh) ends up with the same value.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pairs: Set[Tuple[str, str]] = set()
+
+    def add(self, child_id: str, activity_id: str) -> None:
+        with self._lock:
+            self.pairs.add((child_id, activity_id))
+
+    def drain(self) -> Set[Tuple[str, str]]:
+        with self._lock:
+            pairs, self.pairs = self.pairs, set()
+        return pairs
+
+    def restore(self, pairs: Set[Tuple[str, str]]) -> None:
+        """Puts drained pairs back (their consumer failed)."""
+        with self._lock:
+            self.pairs |= pairs
+
+    def __len__(self) -> int:
+        return len(self.pairs)
+
+
+class RecommendationCache:
+    """
+    Bounded LRU of finished recommendation lists with a TTL.
+
+    Keys are (child_id, limit, refresh_version) tuples; entries for one child can
+    be dropped together when that child's bookings/feedback change. Thread-safe:
+    invalidations come from the threadpool write paths.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Tuple[float, Any]]" = OrderedDict()
+        self._by_child: Dict[Hashable, Set[Tuple[Hashable, ...]]] = {}
+
+        # ====== Stats ======
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _drop(self, key: Tuple[Hashable, ...]) -> None:
+        self._entries.pop(key, None)
+        keys = self._by_child.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_child[key[0]]
+
+    def get(self, key: Tuple[Hashable, ...]) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, value = entry
+            if time.monotonic() >= expires:
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Tuple[Hashable, ...], value: Any, valid: Optional[Callable[[], bool]] = None) -> None:
+        """
+        `valid` is checked under the lock: an invalidation that follows a failed
+        check can't be overtaken by this put.
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if valid is not None and not valid():
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            self._by_child.setdefault(key[0], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def invalidate_child(self, child_id: Hashable) -> None:
+        with self._lock:
+            for key in list(self._by_child.get(child_id, ())):
+                self._drop(key)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._by_child.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+class FoldInTable:
+    """
+    Growable side table of folded-in user factors for children the model doesn't
+    know, kept until the next full refresh (see AIState.publish).
+
+    Each entry remembers the cold_interactions tuple it was solved from; a
+    snapshot that changed the child's interactions carries a new tuple, so a
+    stale factor is recomputed instead of served.
+    """
+
+    def __init__(self, initial_capacity: int = 256):
+        self.initial_capacity = initial_capacity
+        self._lock = threading.Lock()
+        self._factors: Optional[np.ndarray] = None  # float32 [capacity, factors]
+        self._rows: Dict[str, Tuple[int, Any]] = {}  # child_id -> (row, source interactions)
+
+        # ====== Stats ======
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, child_id: str, source: Any) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._rows.get(child_id)
+            if entry is None or entry[1] is not source:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._factors[entry[0]].copy()
+
+    def put(self, child_id: str, source: Any, vector: np.ndarray) -> None:
+        with self._lock:
+            if self._factors is None or self._factors.shape[1] != len(vector):
+                self._factors = np.zeros((self.initial_capacity, len(vector)), dtype=np.float32)
+                self._rows.clear()
+
+            entry = self._rows.get(child_id)
+            if entry is not None:
+                row = entry[0]  # recomputed after the child's interactions changed
+            else:
+                row = len(self._rows)
+                if row >= len(self._factors):
+                    grown = np.zeros((2 * len(self._factors), self._factors.shape[1]), dtype=np.float32)
+                    grown[:len(self._factors)] = self._factors
+                    self._factors = grown
+            self._factors[row] = vector
+            self._rows[child_id] = (row, source)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._factors = None
+            self._rows.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._rows),
+                "capacity": 0 if self._factors is None else len(self._factors),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+@dataclass
+class AIState:
+    # ====== Model & Encoders (loaded from disk, copied into each snapshot) ======
+    # dicts + implicit model when unpickled, SortedEncoder + FactorModel when mmapped;
+    # replaced as a whole by a model reload (ai_service.reload_model)
+    assets: Optional[ModelAssets] = None
+    # outcome of the last reload_model call (reported on /ai/health)
+    last_reload: Dict[str, Any] = field(default_factory=dict)
+
+    # ====== Published Snapshot ======
+    snapshot: AISnapshot = field(default_factory=AISnapshot)
+    # writes since the snapshot was built (merged by the background refresher)
+    pending: InteractionDelta = field(default_factory=InteractionDelta)
+
+    # ====== Per-child result cache ======
+    results: RecommendationCache = field(default_factory=lambda: RecommendationCache(
+        max_entries=int(os.getenv("SAIFI_AI_RESULT_CACHE_SIZE", "10000")),
+        ttl_seconds=float(os.getenv("SAIFI_AI_RESULT_CACHE_TTL_SECONDS", "300")),
+    ))
+
+    # ====== Folded-in factors for children missing from child_encoder ======
+    fold_in: FoldInTable = field(default_factory=FoldInTable)
 
     # ====== Refresh Control ======
-    last_refresh_ts: float = 0.0
     refresh_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    # set to ask the background refresher for an early run (see ai_service.request_refresh)
+    refresh_requested: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def publish(self, snapshot: AISnapshot) -> None:
+        # a single attribute store: readers see either the old or the new snapshot
+        previous = self.snapshot
+        self.snapshot = snapshot
+        if snapshot.refresh_version != previous.refresh_version:
+            # old keys can't be hit any more; free them now instead of waiting for LRU
+            self.results.clear()
+            self.fold_in.clear()
+
+    @property
+    def model(self) -> Optional[Any]:
+        return self.assets.model if self.assets is not None else None
+
+    @property
+    def child_encoder(self) -> Optional[Dict[str, int]]:
+        return self.assets.child_encoder if self.assets is not None else None
+
+    @property
+    def activity_encoder(self) -> Optional[Dict[str, int]]:
+        return self.assets.activity_encoder if self.assets is not None else None
+
+    @property
+    def matrix(self) -> Optional[csr_matrix]:
+        return self.snapshot.matrix
+
+    @property
+    def last_refresh_ts(self) -> float:
+        return self.snapshot.built_ts
+
+    def snapshot_age_seconds(self) -> Optional[float]:
+        if not self.snapshot.version:
+            return None
+        return round(max(0.0, time.time() - self.snapshot.built_ts), 3)
 
 
 STATE = AIState()
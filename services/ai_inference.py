@@ -0,0 +1,149 @@
+# services/ai_inference.py
+"""
+Optional process pool for ALS scoring (SAIFI_AI_INFERENCE_MODE=process).
+
+Each pool process maps the same artifact directory (services.ai_artifacts)
+read-only, so the factors are shared through the page cache rather than copied
+per process, and scoring runs outside the serving process's GIL. Only the
+scoring step (user/fold-in vector x item factors, top-n) is shipped: the
+arguments are an index or a small vector and the results are n ids + scores.
+Ranking and metadata enrichment stay in the serving process, next to the
+snapshot's stores.
+
+Pickled (non-mmappable) models can't be shared this way; for them, scoring
+stays in the calling thread.
+
+A scoring call waits at most `timeout` seconds. If a pool process dies, the
+executor is broken for good, so it is replaced and later calls use the new one.
+"""
+from __future__ import annotations
+
+import logging
+import multiprocessing as mp
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from services.ai_artifacts import FactorModel, load_artifacts
+
+logger = logging.getLogger("saifi.ai.inference")
+
+# ====== Worker side ======
+# artifact dir -> mapped model, in each pool process (only the latest source is kept)
+_WORKER_MODELS: Dict[str, FactorModel] = {}
+_BLAS_LIMIT = None  # kept referenced for the life of the process
+
+
+def _init_worker(blas_threads: int) -> None:
+    # N processes x all-cores BLAS each would oversubscribe the machine
+    from threadpoolctl import threadpool_limits  # installed with implicit
+
+    global _BLAS_LIMIT
+    _BLAS_LIMIT = threadpool_limits(limits=blas_threads, user_api="blas")
+
+
+def _worker_model(source: str) -> FactorModel:
+    model = _WORKER_MODELS.get(source)
+    if model is None:
+        model = load_artifacts(source, mmap=True)[0]
+        _WORKER_MODELS.clear()  # a new model version replaces the old mapping
+        _WORKER_MODELS[source] = model
+    return model
+
+
+def _top_n(scores: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    n = min(n, len(scores))
+    part = np.argpartition(-scores, n - 1)[:n] if n < len(scores) else np.arange(len(scores))
+    order = np.argsort(-scores[part], kind="stable")
+    return part[order].astype(np.int32), scores[part][order].astype(np.float32)
+
+
+def score_user(source: str, user_idx: int, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    model = _worker_model(source)
+    return _top_n(model.item_factors @ model.user_factors[user_idx], n)
+
+
+def score_users(source: str, user_idx: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """score_user for several users: [users, n] ids and scores from one matmul."""
+    model = _worker_model(source)
+    scores = model.user_factors[user_idx] @ model.item_factors.T
+    top = [_top_n(row, n) for row in scores]
+    return np.stack([ids for ids, _ in top]), np.stack([sc for _, sc in top])
+
+
+def score_vector(source: str, vector: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    return _top_n(_worker_model(source).item_factors @ vector, n)
+
+
+def _warm(source: Optional[str]) -> int:
+    if source:
+        _worker_model(source)
+    return os.getpid()
+
+
+# ====== Serving side ======
+class InferencePool:
+    """A small spawn-context process pool plus the artifact dirs it can score for."""
+
+    def __init__(self, processes: int, blas_threads: int = 1, timeout: Optional[float] = None):
+        self.processes = processes
+        self.blas_threads = blas_threads
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn, not fork: the serving process has threads (executors, DB pool)
+        return ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.blas_threads,),
+        )
+
+    def _replace(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is not broken:
+                return  # another caller already replaced it
+            logger.warning("AI inference pool broken (a process died); starting a new one")
+            self._executor = self._new_executor()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        executor = self._executor
+        try:
+            future = executor.submit(fn, *args)
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                future.cancel()  # still queued: don't leave it for the workers
+                raise
+        except BrokenProcessPool:
+            self._replace(executor)
+            raise
+
+    @staticmethod
+    def can_score(source: Optional[str]) -> bool:
+        return bool(source) and os.path.isdir(source)
+
+    def warm(self, source: Optional[str]) -> None:
+        """Starts the processes and maps `source`, so the first requests don't pay for it."""
+        pids = {f.result() for f in [self._executor.submit(_warm, source) for _ in range(self.processes * 2)]}
+        logger.info("AI inference pool ready: %d processes (%d warmed), source=%s",
+                    self.processes, len(pids), source)
+
+    def score_user(self, source: str, user_idx: int, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        return self._call(score_user, source, int(user_idx), n)
+
+    def score_users(self, source: str, user_idx: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        return self._call(score_users, source, np.asarray(user_idx, dtype=np.int64), n)
+
+    def score_vector(self, source: str, vector: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        return self._call(score_vector, source, np.asarray(vector, dtype=np.float32), n)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
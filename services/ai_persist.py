@@ -0,0 +1,217 @@
+# services/ai_persist.py
+"""
+Built AISnapshots on disk, so a starting worker can serve from the last refresh's
+output before its own first refresh reaches the database.
+
+One file pair per model version in SAIFI_AI_SNAPSHOT_DIR:
+
+    snapshot-<version>.npz   arrays only (no pickle): matrix, metadata columns,
+                             popularity, top-K / neighbor tables, fold-in inputs
+    snapshot-<version>.json  manifest: format, the assets it was built against,
+                             built_ts, sizes, and the id of the .npz it describes
+
+A snapshot is only restored for the exact assets it was built with (version,
+source, encoder sizes, source mtime); anything else is ignored, not patched up.
+"""
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from services.ai_cache import AISnapshot, ModelAssets, store_memory_totals
+from services.ai_ranking import SpatialIndex
+from services.ai_store import ActivityStore, ChildStore
+
+SNAPSHOT_FORMAT = "saifi-ai-snapshot/1"
+
+
+def _version_key(assets: ModelAssets) -> str:
+    version = assets.version or "unversioned"
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in version)
+
+
+def snapshot_paths(snapshot_dir: str, assets: ModelAssets) -> Tuple[str, str]:
+    base = os.path.join(snapshot_dir, f"snapshot-{_version_key(assets)}")
+    return base + ".npz", base + ".json"
+
+
+def assets_fingerprint(assets: ModelAssets) -> Dict[str, Any]:
+    """What a snapshot must have been built against to be reused with `assets`."""
+    try:
+        source_mtime = os.path.getmtime(assets.source)
+    except (OSError, TypeError):
+        source_mtime = None
+    return {
+        "version": assets.version,
+        "source": os.path.abspath(assets.source) if assets.source else assets.source,
+        "source_mtime": source_mtime,
+        "children": len(assets.child_encoder or {}),
+        "activities": len(assets.activity_encoder or {}),
+        "factors": int(np.asarray(assets.model.item_factors).shape[1]) if assets.model is not None else None,
+    }
+
+
+def _atomic_write(path: str, write) -> None:
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=".snapshot-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.chmod(tmp, 0o644)  # mkstemp is owner-only; workers may run as another user
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _put_optional(arrays: Dict[str, np.ndarray], name: str, value: Optional[np.ndarray]) -> None:
+    if value is not None:
+        arrays[name] = value
+
+
+def save_snapshot(snap: AISnapshot, assets: ModelAssets, snapshot_dir: str) -> Dict[str, Any]:
+    """Writes the .npz, then the manifest naming it; each file is replaced atomically."""
+    arrays: Dict[str, np.ndarray] = {}
+
+    if snap.matrix is not None:
+        arrays["matrix_data"] = snap.matrix.data
+        arrays["matrix_indices"] = snap.matrix.indices
+        arrays["matrix_indptr"] = snap.matrix.indptr
+        arrays["matrix_shape"] = np.array(snap.matrix.shape, dtype=np.int64)
+
+    for prefix, store in (("children", snap.children), ("activities", snap.activities)):
+        for name, values in store.to_arrays().items():
+            arrays[f"{prefix}__{name}"] = values
+
+    popularity = list(snap.popularity.items())
+    arrays["popularity_ids"] = np.array([aid for aid, _ in popularity], dtype=str)
+    arrays["popularity_sums"] = np.array([s for _, (s, _) in popularity], dtype=np.float64)
+    arrays["popularity_counts"] = np.array([c for _, (_, c) in popularity], dtype=np.int64)
+    arrays["popular_activity_ids"] = np.array(snap.popular_activity_ids, dtype=str)
+    arrays["popular_rows"] = snap.popular_rows
+    arrays["popularity_rank"] = snap.popularity_rank
+
+    _put_optional(arrays, "top_k_items", snap.top_k_items)
+    _put_optional(arrays, "top_k_scores", snap.top_k_scores)
+    _put_optional(arrays, "item_gram", snap.item_gram)
+    _put_optional(arrays, "item_neighbors", snap.item_neighbors)
+    _put_optional(arrays, "item_neighbor_scores", snap.item_neighbor_scores)
+
+    # cold_interactions as one CSR-like block: child ids + offsets into items/confidence
+    cold = list(snap.cold_interactions.items())
+    arrays["cold_ids"] = np.array([cid for cid, _ in cold], dtype=str)
+    arrays["cold_offsets"] = np.cumsum([0] + [len(items) for _, (items, _) in cold]).astype(np.int64)
+    arrays["cold_items"] = (np.concatenate([items for _, (items, _) in cold]) if cold
+                            else np.empty(0, dtype=np.int32)).astype(np.int32)
+    arrays["cold_confidence"] = (np.concatenate([conf for _, (_, conf) in cold]) if cold
+                                 else np.empty(0, dtype=np.float32)).astype(np.float32)
+
+    snapshot_id = uuid.uuid4().hex
+    arrays["snapshot_id"] = np.array(snapshot_id)
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    npz_path, manifest_path = snapshot_paths(snapshot_dir, assets)
+    _atomic_write(npz_path, lambda f: np.savez(f, **arrays))
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "snapshot_id": snapshot_id,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "built_ts": snap.built_ts,
+        "assets": assets_fingerprint(assets),
+        "matrix_nnz": int(snap.matrix.nnz) if snap.matrix is not None else 0,
+        "children": snap.children.count,
+        "activities": snap.activities.count,
+        "bytes": os.path.getsize(npz_path),
+    }
+    _atomic_write(manifest_path, lambda f: f.write(json.dumps(manifest, indent=2).encode()))
+    return manifest
+
+
+def load_snapshot(
+    assets: ModelAssets,
+    snapshot_dir: str,
+    max_age_seconds: float = 0.0,
+) -> Optional[Tuple[AISnapshot, Dict[str, Any]]]:
+    """
+    (snapshot, manifest) saved for exactly these assets, or None if there is none,
+    it was built for other assets, or it is older than max_age_seconds (0 = any age).
+    The snapshot comes back with version/refresh_version 0; the caller numbers it.
+    """
+    npz_path, manifest_path = snapshot_paths(snapshot_dir, assets)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+
+    if manifest.get("format") != SNAPSHOT_FORMAT or manifest.get("assets") != assets_fingerprint(assets):
+        return None
+    if max_age_seconds > 0 and time.time() - manifest.get("built_ts", 0) > max_age_seconds:
+        return None
+
+    with np.load(npz_path, allow_pickle=False) as npz:
+        arrays = {name: npz[name] for name in npz.files}
+    if str(arrays["snapshot_id"]) != manifest["snapshot_id"]:
+        return None  # .npz replaced by another writer after this manifest was written
+
+    matrix = None
+    if "matrix_data" in arrays:
+        matrix = csr_matrix(
+            (arrays["matrix_data"], arrays["matrix_indices"], arrays["matrix_indptr"]),
+            shape=tuple(arrays["matrix_shape"].tolist()),
+        )
+
+    def store_arrays(prefix: str) -> Dict[str, np.ndarray]:
+        return {name[len(prefix) + 2:]: value for name, value in arrays.items() if name.startswith(prefix + "__")}
+
+    children = ChildStore.from_arrays(store_arrays("children"), assets.child_encoder or {})
+    activities = ActivityStore.from_arrays(store_arrays("activities"), assets.activity_encoder or {})
+
+    popularity = {
+        aid: (s, c) for aid, s, c in zip(
+            arrays["popularity_ids"].tolist(),
+            arrays["popularity_sums"].tolist(),
+            arrays["popularity_counts"].tolist(),
+        )
+    }
+
+    offsets = arrays["cold_offsets"]
+    cold_interactions = {
+        cid: (arrays["cold_items"][offsets[i]:offsets[i + 1]], arrays["cold_confidence"][offsets[i]:offsets[i + 1]])
+        for i, cid in enumerate(arrays["cold_ids"].tolist())
+    }
+
+    snapshot = AISnapshot(
+        built_ts=float(manifest["built_ts"]),
+        model_version=assets.version,
+        model_source=assets.source,
+        model=assets.model,
+        quantized=assets.quantized,
+        child_encoder=assets.child_encoder,
+        activity_encoder=assets.activity_encoder,
+        matrix=matrix,
+        children=children,
+        activities=activities,
+        store_memory_bytes=store_memory_totals(children, activities),
+        popularity=popularity,
+        popular_activity_ids=tuple(arrays["popular_activity_ids"].tolist()),
+        popular_rows=arrays["popular_rows"],
+        popularity_rank=arrays["popularity_rank"],
+        activity_index=SpatialIndex.build(activities),
+        top_k_items=arrays.get("top_k_items"),
+        top_k_scores=arrays.get("top_k_scores"),
+        cold_interactions=cold_interactions,
+        item_gram=arrays.get("item_gram"),
+        item_neighbors=arrays.get("item_neighbors"),
+        item_neighbor_scores=arrays.get("item_neighbor_scores"),
+        restored_from=npz_path,
+    )
+    return snapshot, manifest
@@ -0,0 +1,163 @@
+# services/ai_quant.py
+"""
+Quantized copies of the ALS factors for candidate generation (SAIFI_AI_QUANTIZE).
+
+    float16  2 bytes per factor
+    int8     1 byte per factor + one float32 scale per row (symmetric, max-abs)
+
+Only the item side is quantized. Scoring multiplies the quantized item factors
+by the exact float32 user (or fold-in) vector to pick n * oversample
+candidates, then re-scores only those rows with the float32 item factors and
+keeps the exact top n. So the returned scores are exact. The only loss is an
+item the quantized scan ranked below the candidate cut
+(benchmarks/bench_quantized.py measures it as overlap@K).
+
+`python -m services.ai_artifacts export --quantize int8` writes the codes into
+the artifact set, and workers map them like the float32 factors: one shared
+page-cache copy. The float32 item factors are then read only for the re-scored
+rows. For pickled models (or artifacts exported without codes) the codes are
+built in memory at load.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+QUANT_MODES = ("float16", "int8")
+
+# rows dequantized per step of a scan: the float32 scratch block stays in cache
+SCAN_BLOCK_ROWS = 8192
+
+
+class QuantizedFactors:
+    """Row-quantized [rows, factors] matrix; `scales` is None for float16."""
+
+    def __init__(self, codes: np.ndarray, scales: Optional[np.ndarray] = None):
+        self.codes = codes
+        self.scales = scales
+
+    @classmethod
+    def build(cls, factors: np.ndarray, mode: str) -> "QuantizedFactors":
+        if mode not in QUANT_MODES:
+            raise ValueError(f"Unsupported quantization mode: {mode!r} (expected one of {QUANT_MODES})")
+        rows = factors.shape[0]
+        if mode == "float16":
+            codes = np.empty(factors.shape, dtype=np.float16)
+            for start in range(0, rows, SCAN_BLOCK_ROWS):
+                codes[start:start + SCAN_BLOCK_ROWS] = factors[start:start + SCAN_BLOCK_ROWS]
+            return cls(codes)
+
+        codes = np.empty(factors.shape, dtype=np.int8)
+        scales = np.empty(rows, dtype=np.float32)
+        for start in range(0, rows, SCAN_BLOCK_ROWS):
+            block = np.asarray(factors[start:start + SCAN_BLOCK_ROWS], dtype=np.float32)
+            scale = np.abs(block).max(axis=1) / 127.0
+            scale[scale == 0] = 1.0  # all-zero row: any scale decodes to zeros
+            codes[start:start + len(block)] = np.rint(block / scale[:, None])
+            scales[start:start + len(block)] = scale
+        return cls(codes, scales)
+
+    @property
+    def mode(self) -> str:
+        return "int8" if self.scales is not None else "float16"
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.codes.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def dot(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Approximate rows @ vectors.T: [rows] for one vector, [n, rows] for n.
+        Blocks are dequantized into one float32 scratch buffer, so the scan never
+        materializes the float32 matrix.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        single = vectors.ndim == 1
+        vectors = np.atleast_2d(vectors)
+        n_rows = self.codes.shape[0]
+
+        out = np.empty((len(vectors), n_rows), dtype=np.float32)
+        scratch = np.empty((min(SCAN_BLOCK_ROWS, n_rows), self.codes.shape[1]), dtype=np.float32)
+        for start in range(0, n_rows, SCAN_BLOCK_ROWS):
+            stop = min(start + SCAN_BLOCK_ROWS, n_rows)
+            block = scratch[:stop - start]
+            block[...] = self.codes[start:stop]
+            np.dot(vectors, block.T, out=out[:, start:stop])
+        if self.scales is not None:
+            out *= self.scales
+        return out[0] if single else out
+
+
+class QuantizedModel:
+    """Quantized item factors of one model version, next to its float32 factors."""
+
+    def __init__(self, model, item_codes: QuantizedFactors, oversample: int = 4):
+        if item_codes.shape != np.shape(model.item_factors):
+            raise ValueError(f"Quantized items {item_codes.shape} don't match item_factors {np.shape(model.item_factors)}")
+        self.model = model
+        self.item_codes = item_codes
+        self.oversample = max(1, oversample)
+
+    @classmethod
+    def build(cls, model, mode: str, oversample: int = 4) -> "QuantizedModel":
+        return cls(model, QuantizedFactors.build(model.item_factors, mode), oversample)
+
+    @property
+    def mode(self) -> str:
+        return self.item_codes.mode
+
+    @property
+    def nbytes(self) -> int:
+        return self.item_codes.nbytes
+
+    @property
+    def mapped(self) -> bool:
+        return isinstance(self.item_codes.codes, np.memmap)
+
+    def float32_nbytes(self) -> int:
+        return int(np.prod(np.shape(self.model.item_factors))) * 4
+
+    def _rescore(self, approx: np.ndarray, exact: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top n of `approx` * oversample, re-scored with float32 item rows against `exact`."""
+        n = min(n, len(approx))
+        m = min(n * self.oversample, len(approx))
+        cand = np.argpartition(-approx, m - 1)[:m] if m < len(approx) else np.arange(len(approx))
+        cand.sort()  # ascending rows: sequential reads from the (mapped) float32 factors
+        scores = np.asarray(self.model.item_factors[cand], dtype=np.float32) @ exact
+        top = np.argpartition(-scores, n - 1)[:n] if n < m else np.arange(m)
+        order = top[np.argsort(-scores[top], kind="stable")]
+        return cand[order].astype(np.int32), scores[order].astype(np.float32)
+
+    def recommend_user(self, user_idx: int, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        return self.recommend_vector(self.model.user_factors[user_idx], n)
+
+    def recommend_users(self, user_idx: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """recommend_user for several users; one scan, [users, n] results."""
+        users = np.asarray(user_idx, dtype=np.int64)
+        exact = np.asarray(self.model.user_factors[users], dtype=np.float32)
+        approx = self.item_codes.dot(exact)
+        n = min(n, approx.shape[1])
+        ids = np.empty((len(users), n), dtype=np.int32)
+        scores = np.empty((len(users), n), dtype=np.float32)
+        for i in range(len(users)):
+            ids[i], scores[i] = self._rescore(approx[i], exact[i], n)
+        return ids, scores
+
+    def recommend_vector(self, vector: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top n items for a user or fold-in vector."""
+        vector = np.asarray(vector, dtype=np.float32)
+        return self._rescore(self.item_codes.dot(vector), vector, n)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "oversample": self.oversample,
+            "mapped": self.mapped,
+            "bytes": self.nbytes,
+            "float32_bytes": self.float32_nbytes(),
+        }
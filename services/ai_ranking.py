@@ -0,0 +1,164 @@
+# services/ai_ranking.py
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from services.ai_store import ActivityStore
+
+EARTH_RADIUS_KM = 6371.0
+
+
+# =========================
+# Vectorized distance / filtering / ranking
+# =========================
+def haversine_km(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Same formula as ai_service.calc_distance, for one origin against many points."""
+    lat1 = np.radians(lat)
+    lat2 = np.radians(lats)
+    d_lat = lat2 - lat1
+    d_lon = np.radians(lngs) - np.radians(lng)
+
+    a = np.sin(d_lat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(d_lon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def age_mask(store: ActivityStore, rows: np.ndarray, child_age: Optional[float]) -> np.ndarray:
+    """True where the activity accepts the child (or either side of the check is unknown)."""
+    if child_age is None:
+        return np.ones(len(rows), dtype=bool)
+    lo = store.min_age[rows]
+    hi = store.max_age[rows]
+    unknown = np.isnan(lo) | np.isnan(hi)
+    with np.errstate(invalid="ignore"):
+        return unknown | ((lo <= child_age) & (child_age <= hi))
+
+
+def top_k(primary: np.ndarray, secondary: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions of the k smallest (primary, secondary, position) keys, in order.
+    argpartition picks the k-th primary value; only rows at or below it get sorted.
+    """
+    n = len(primary)
+    if n == 0 or k <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    if k < n:
+        kth = primary[np.argpartition(primary, k - 1)[k - 1]]
+        cand = np.flatnonzero(primary <= kth)
+    else:
+        cand = np.arange(n)
+
+    order = np.lexsort((cand, secondary[cand], primary[cand]))
+    return cand[order][:k]
+
+
+def rank_by_distance(
+    store: ActivityStore,
+    rows: np.ndarray,
+    scores: np.ndarray,
+    child_lat: float,
+    child_lng: float,
+    limit: int,
+    tiebreak: Optional[np.ndarray] = None,
+    dist: Optional[np.ndarray] = None,
+):
+    """
+    Nearest first (distance compared at 10 m resolution); ties go to the smaller
+    `tiebreak`, which defaults to the higher score. `dist` (km per row) skips the
+    haversine when the caller already has it.
+    """
+    if dist is None:
+        dist = haversine_km(child_lat, child_lng, store.lat[rows], store.lng[rows])
+    dist = np.round(dist, 2)
+    picked = top_k(dist, -scores if tiebreak is None else tiebreak, limit)
+    return rows[picked], scores[picked], dist[picked]
+
+
+# =========================
+# Spatial index (nearest activities)
+# =========================
+def _unit_xyz(lat, lng) -> np.ndarray:
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lng = np.radians(np.asarray(lng, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)], axis=-1)
+
+
+class SpatialIndex:
+    """
+    KD-tree over activity locations as points on the unit sphere. Straight-line
+    (chord) distance there orders points exactly like great-circle distance, so
+    k-nearest queries need no haversine until the final re-rank.
+    """
+
+    def __init__(self, rows: np.ndarray, lat: np.ndarray, lng: np.ndarray):
+        self.rows = rows
+        self.tree = cKDTree(_unit_xyz(lat, lng)) if len(rows) else None
+
+    @classmethod
+    def build(cls, store: ActivityStore) -> "SpatialIndex":
+        rows = np.flatnonzero(store.present)
+        return cls(rows, store.lat[rows], store.lng[rows])
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def nearest(
+        self,
+        lat: float,
+        lng: float,
+        k: int,
+        accept: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+    ) -> np.ndarray:
+        """
+        Store rows nearest to (lat, lng), nearest first. Returns at least k rows
+        that pass `accept` (a row-array -> bool-mask filter) unless fewer exist;
+        the search widens 4x per round when the filter rejects too many.
+        """
+        n = len(self.rows)
+        if n == 0 or k <= 0:
+            return np.empty(0, dtype=np.int64)
+
+        point = _unit_xyz(lat, lng)
+        q = min(n, max(2 * k, 16))
+        while True:
+            _, idx = self.tree.query(point, k=q)
+            cand = self.rows[np.atleast_1d(idx)]
+            if accept is not None:
+                cand = cand[accept(cand)]
+            if len(cand) >= k or q >= n:
+                return cand
+            q = min(n, q * 4)
+
+
+def to_results(
+    store: ActivityStore,
+    rows: np.ndarray,
+    scores: np.ndarray,
+    dist: Optional[np.ndarray],
+    source: str,
+) -> List[Dict[str, Any]]:
+    """Response dicts for the final rows only (dist=None: no origin, distance_km is null)."""
+    distances = dist.tolist() if dist is not None else [None] * len(rows)
+    results = []
+    for row, score, d in zip(rows.tolist(), scores.tolist(), distances):
+        min_age = store.min_age[row]
+        max_age = store.max_age[row]
+        results.append({
+            "activity_id": store.ids[row],
+            "activity_name": store.name[row],
+            "score": float(score),
+            "distance_km": d,
+            "category": store.category[row],
+            "price": float(store.price[row]),
+            "duration_hours": int(store.duration_hours[row]),
+            "min_age": int(min_age) if not np.isnan(min_age) else 0,
+            "max_age": int(max_age) if not np.isnan(max_age) and max_age else 99,
+            "lat": float(store.lat[row]),
+            "lng": float(store.lng[row]),
+            "source": source
+        })
+    return results
@@ -1,17 +1,31 @@
 # services/ai_service.py
 from __future__ import annotations
 
+import asyncio
+import dataclasses
 import logging
 import math
 import os
 import pickle
+import random
 import time
-from typing import Any, Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice, repeat
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple
 
 import numpy as np
 from scipy.sparse import csr_matrix
-from db.connection import get_connection
-from services.ai_cache import STATE
+from db.connection import copy_query, stream_query
+from services.ai_artifacts import REGISTRY_DIR, latest_version, load_artifacts, load_quantized, version_dir
+from services.ai_cache import STATE, AISnapshot, ModelAssets, store_memory_totals
+from services.ai_inference import InferencePool
+from services.ai_persist import load_snapshot, save_snapshot
+from services.ai_quant import QuantizedFactors, QuantizedModel
+from services.ai_ranking import SpatialIndex, age_mask, haversine_km, rank_by_distance, to_results
+from services.ai_store import ActivityStore, ChildStore
+from utils.metrics import counter, summary
+from utils.singleflight import SingleFlight
+from utils.thread_budget import BATCH_THREADS, REQUEST_THREADS, limit_model_threads, run_batch, with_threads
 
 logger = logging.getLogger("saifi.ai")
 
@@ -19,9 +33,77 @@ logger = logging.getLogger("saifi.ai")
 MODEL_PATH = os.getenv("SAIFI_MODEL_PATH", "saifi_model.pkl")
 CHILD_ENCODER_PATH = os.getenv("SAIFI_CHILD_ENCODER_PATH", "child_encoder.pkl")
 ACTIVITY_ENCODER_PATH = os.getenv("SAIFI_ACTIVITY_ENCODER_PATH", "activity_encoder.pkl")
+# directory written by `python -m services.ai_artifacts export`; when set, the
+# factors/encoders are memory-mapped from it instead of unpickled per worker
+ARTIFACT_DIR = os.getenv("SAIFI_ARTIFACT_DIR", "")
+# how often the refresher checks the registry's LATEST file for a new version (0 disables)
+MODEL_WATCH_SECONDS = float(os.getenv("SAIFI_MODEL_WATCH_SECONDS", "30"))
 
 # refresh every N seconds (optional). set 0 to disable auto refresh checks.
 REFRESH_TTL_SECONDS = int(os.getenv("SAIFI_AI_REFRESH_TTL_SECONDS", "0"))
+# +/- random spread on each scheduled refresh so workers don't hit the DB in lockstep
+REFRESH_JITTER_SECONDS = float(os.getenv("SAIFI_AI_REFRESH_JITTER_SECONDS", "30"))
+# retry cadence while no snapshot could be built yet (DB down at startup etc.)
+# and after a failed full refresh
+REFRESH_RETRY_SECONDS = float(os.getenv("SAIFI_AI_REFRESH_RETRY_SECONDS", "15"))
+# how the refresh reads bookings: "cursor" (server-side cursor batches, decoded row
+# by row by psycopg2) or "copy" (COPY ... TO STDOUT, parsed by numpy in batches;
+# see benchmarks/bench_refresh_load.py before switching)
+REFRESH_LOADER = os.getenv("SAIFI_AI_REFRESH_LOADER", "cursor")
+# COPY rows parsed per batch by the "copy" loader
+COPY_BATCH_ROWS = int(os.getenv("SAIFI_AI_COPY_BATCH_ROWS", "65536"))
+# each full refresh is saved here (services.ai_persist) and new workers start from it
+# while their own first refresh runs; empty disables
+SNAPSHOT_DIR = os.getenv("SAIFI_AI_SNAPSHOT_DIR", "ai_snapshots")
+# saved snapshots older than this are not restored (0 = any age)
+SNAPSHOT_MAX_AGE_SECONDS = float(os.getenv("SAIFI_AI_SNAPSHOT_MAX_AGE_SECONDS", "86400"))
+# how often booking/feedback writes are folded into the snapshot between full refreshes
+DELTA_MERGE_SECONDS = float(os.getenv("SAIFI_AI_DELTA_MERGE_SECONDS", "5"))
+
+# implicit-feedback confidence: 1 + alpha * rating
+CONFIDENCE_ALPHA = 40.0
+
+# top-K ALS items per encoded child, scored in batch at refresh (0 disables)
+PRECOMPUTE_TOP_K = int(os.getenv("SAIFI_AI_PRECOMPUTE_TOP_K", "100"))
+PRECOMPUTE_BATCH_SIZE = int(os.getenv("SAIFI_AI_PRECOMPUTE_BATCH_SIZE", "2048"))
+
+# nearest activities per activity in item-factor space, for /ai/similar (0 disables)
+SIMILAR_TOP_K = int(os.getenv("SAIFI_AI_SIMILAR_TOP_K", "50"))
+SIMILAR_BLOCK_SIZE = int(os.getenv("SAIFI_AI_SIMILAR_BLOCK_SIZE", "1024"))
+
+# threads computing recommendation cache misses
+INFERENCE_THREADS = int(os.getenv("SAIFI_AI_INFERENCE_THREADS", "4"))
+# "thread": ALS scoring in those threads; "process": in a process pool mapping the
+# artifact factors (services.ai_inference; needs mmap artifacts, not pickles)
+INFERENCE_MODE = os.getenv("SAIFI_AI_INFERENCE_MODE", "thread")
+INFERENCE_PROCESSES = int(os.getenv("SAIFI_AI_INFERENCE_PROCESSES", "2"))
+# longest wait for one process-pool scoring call; past it the request falls back
+INFERENCE_TIMEOUT_SECONDS = float(os.getenv("SAIFI_AI_INFERENCE_TIMEOUT_SECONDS", "5"))
+# distinct cache-miss computations allowed in flight; beyond it requests fail fast (503)
+INFERENCE_MAX_PENDING = int(os.getenv("SAIFI_AI_INFERENCE_MAX_PENDING", "64"))
+# "float16" / "int8": ALS candidates from quantized factors, re-scored in float32
+# (services.ai_quant); empty keeps float32 scoring throughout
+QUANTIZE = os.getenv("SAIFI_AI_QUANTIZE", "")
+# quantized candidates per requested item that get the float32 re-score
+QUANTIZE_OVERSAMPLE = int(os.getenv("SAIFI_AI_QUANTIZE_OVERSAMPLE", "4"))
+
+# ====== Metrics (served on /metrics) ======
+RECOMMEND_STAGE_SECONDS = summary(
+    "saifi_ai_recommend_stage_seconds", "Time per stage of the recommendation path", ["stage"])
+REFRESH_STAGE_SECONDS = summary(
+    "saifi_ai_refresh_stage_seconds", "Time per stage of a full AI cache refresh", ["stage"])
+RECOMMENDATIONS = counter(
+    "saifi_ai_recommendations_total", "Recommendation lists served, by how they were produced", ["source"])
+AI_EXCEPTIONS = counter(
+    "saifi_ai_exceptions_total", "Exceptions caught (and logged) by the AI service", ["operation"])
+COALESCED = counter(
+    "saifi_ai_coalesced_requests_total", "Recommendation requests that shared another request's computation")
+REJECTED = counter(
+    "saifi_ai_rejected_requests_total", "Recommendation requests refused because too many were in flight")
+
+
+class AIOverloaded(Exception):
+    """More than INFERENCE_MAX_PENDING distinct recommendations are being computed."""
 
 
 # =========================
@@ -54,45 +136,562 @@ def _load_pickle(path: str) -> Any:
         return pickle.load(f)
 
 
-def load_assets_once() -> None:
-    """Call this once at startup."""
-    if STATE.model is not None and STATE.child_encoder and STATE.activity_encoder:
-        return
-
-    STATE.model = _load_pickle(MODEL_PATH)
-    STATE.child_encoder = _load_pickle(CHILD_ENCODER_PATH)
-    STATE.activity_encoder = _load_pickle(ACTIVITY_ENCODER_PATH)
+def _validate_assets(model: Any, child_encoder: Dict[str, int], activity_encoder: Dict[str, int]) -> None:
+    """Refuse a model whose factors don't cover its encoders (or aren't finite)."""
+    user_factors = np.asarray(model.user_factors)
+    item_factors = np.asarray(model.item_factors)
+    if user_factors.ndim != 2 or item_factors.ndim != 2 or user_factors.shape[1] != item_factors.shape[1]:
+        raise ValueError(f"Factor shapes don't match: users={user_factors.shape} items={item_factors.shape}")
+    if child_encoder and max(child_encoder.values()) >= user_factors.shape[0]:
+        raise ValueError("child_encoder has indices beyond user_factors")
+    if activity_encoder and max(activity_encoder.values()) >= item_factors.shape[0]:
+        raise ValueError("activity_encoder has indices beyond item_factors")
+    if not (np.isfinite(user_factors).all() and np.isfinite(item_factors).all()):
+        raise ValueError("Model factors contain NaN/inf")
+
+
+def _load_quantized(model: Any, artifact_dir: Optional[str]) -> QuantizedModel:
+    """Maps the exported item codes when the artifact set has them, else quantizes in memory."""
+    codes = load_quantized(artifact_dir, QUANTIZE) if artifact_dir else None
+    if codes is None:
+        if artifact_dir:
+            logger.warning("%s has no %s item codes; quantizing per worker (export with --quantize %s to share them)",
+                           artifact_dir, QUANTIZE, QUANTIZE)
+        codes = QuantizedFactors.build(model.item_factors, QUANTIZE)
+    return QuantizedModel(model, codes, QUANTIZE_OVERSAMPLE)
+
+
+def _load_assets(version: Optional[str] = None) -> ModelAssets:
+    """
+    Loads + validates one model version. Source, in order: the given registry
+    version, SAIFI_ARTIFACT_DIR, the registry's LATEST, the legacy pickles.
+    """
+    started = time.perf_counter()
+    if version is None and not ARTIFACT_DIR:
+        version = latest_version()
+
+    artifact_dir = None
+    if version is not None:
+        source = artifact_dir = version_dir(version)
+        model, child_encoder, activity_encoder, _ = load_artifacts(source)
+    elif ARTIFACT_DIR:
+        source = artifact_dir = ARTIFACT_DIR
+        model, child_encoder, activity_encoder, manifest = load_artifacts(source)
+        version = manifest.get("version") or os.path.basename(os.path.normpath(source))
+    else:
+        source = MODEL_PATH
+        model = _load_pickle(MODEL_PATH)
+        child_encoder = _load_pickle(CHILD_ENCODER_PATH)
+        activity_encoder = _load_pickle(ACTIVITY_ENCODER_PATH)
+
+    _validate_assets(model, child_encoder, activity_encoder)
+    limit_model_threads(model)
+    quantized = _load_quantized(model, artifact_dir) if QUANTIZE else None
+    load_ms = (time.perf_counter() - started) * 1000
+
+    logger.info("AI assets loaded from %s in %.1f ms: version=%s model=%s children=%d activities=%d quantize=%s",
+                source,
+                load_ms,
+                version,
+                type(model).__name__,
+                len(child_encoder),
+                len(activity_encoder),
+                QUANTIZE or "off")
+    return ModelAssets(
+        model=model,
+        child_encoder=child_encoder,
+        activity_encoder=activity_encoder,
+        version=version,
+        source=source,
+        quantized=quantized,
+        load_ms=round(load_ms, 3),
+        loaded_ts=time.time(),
+    )
 
-    # ALS internal index -> UUID
-    STATE.reverse_activity_map = {v: k for k, v in STATE.activity_encoder.items()}
 
-    logger.info("AI assets loaded: model=%s children=%d activities=%d",
-                type(STATE.model).__name__,
-                len(STATE.child_encoder),
-                len(STATE.activity_encoder))
+def load_assets_once() -> None:
+    """Call this once at startup. Later model changes go through reload_model."""
+    if STATE.assets is not None:
+        return
+    STATE.assets = _load_assets()
 
 
 # =========================
 # Data loading + matrix build (cached)
 # =========================
 
-def fetch_all(query: str):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(query)
+def stream_dicts(query: str) -> Iterator[Dict[str, Any]]:
+    """Rows as dicts, one server-side batch at a time (only the current batch is in memory)."""
+    for names, rows in stream_query(query):
+        for row in rows:
+            yield dict(zip(names, row))
+
+
+def fetch_columns(query: str) -> Dict[str, List[Any]]:
+    """Whole result column-wise ({column: values}), with no per-row tuples or dicts kept."""
+    columns: Dict[str, List[Any]] = {}
+    for names, rows in stream_query(query):
+        if not columns:
+            columns = {name: [] for name in names}
+        for name, values in zip(names, zip(*rows)):
+            columns[name].extend(values)
+    return columns
+
+
+# BOOKINGS_QUERY columns as COPY emits them; ids are uuid::text, always 36 ASCII
+# chars, kept as bytes (S36: 36 bytes per id, U36 would take 144)
+INTERACTION_DTYPE = np.dtype([("child_id", "S36"), ("activity_id", "S36"), ("rating", np.float64)])
+
+
+def copy_interaction_batches(query: str, batch_rows: int = COPY_BATCH_ROWS) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    (child_id, activity_id, rating) column batches of `query` through COPY ... TO
+    STDOUT, parsed into arrays by np.loadtxt `batch_rows` lines at a time (NULL
+    rating -> NaN). The COPY output itself is spooled to disk past
+    DB_COPY_SPOOL_BYTES, so memory stays at about one batch.
+    """
+    with copy_query(query, options="FORMAT csv, NULL 'NaN'") as out:
+        while True:
+            lines = list(islice(out, batch_rows))
+            if not lines:
+                return
+            rows = np.loadtxt(lines, dtype=INTERACTION_DTYPE, delimiter=",", ndmin=1, encoding="utf-8")
+            yield {name: rows[name] for name in INTERACTION_DTYPE.names}
+
+
+# ====== Refresh queries ======
+# one row per child; location is the parent's (home), as for cold-start recommendations
+CHILDREN_QUERY = """
+    SELECT
+        c.child_id::text AS child_id,
+        EXTRACT(YEAR FROM AGE(c.birthdate))::int AS age,
+        c.gender,
+        p.location_lat AS lat,
+        p.location_lng AS lng
+    FROM children c
+    LEFT JOIN parents p ON c.parent_id = p.parent_id
+"""
+
+ACTIVITIES_QUERY = """
+    SELECT
+        a.activity_id::text AS activity_id,
+        a.title AS activity_name,
+        a.type AS category,
+        a.price,
+        a.duration AS duration_hours,
+        a.age_from AS min_age,
+        a.age_to AS max_age,
+        pr.location_lat AS activity_lat,
+        pr.location_lng AS activity_lng
+    FROM activities a
+    JOIN providers pr ON a.provider_id = pr.provider_id
+"""
+
+# rejected bookings are not interactions; rating comes from the child's feedback on the activity
+BOOKINGS_QUERY = """
+    SELECT
+        b.child_id::text AS child_id,
+        b.activity_id::text AS activity_id,
+        f.rating
+    FROM bookings b
+    LEFT JOIN (
+        SELECT child_id, activity_id, AVG(rating)::float AS rating
+        FROM feedback
+        WHERE rating IS NOT NULL
+        GROUP BY child_id, activity_id
+    ) f ON f.child_id = b.child_id AND f.activity_id = b.activity_id
+    WHERE b.status IS DISTINCT FROM 'rejected'
+"""
+
+# BOOKINGS_QUERY for the (child_id, activity_id) pairs a delta merge re-reads
+PAIR_BOOKINGS_QUERY = """
+    SELECT
+        b.child_id::text AS child_id,
+        b.activity_id::text AS activity_id,
+        f.rating
+    FROM unnest(%(child_ids)s::uuid[], %(activity_ids)s::uuid[]) AS p(child_id, activity_id)
+    JOIN bookings b ON b.child_id = p.child_id AND b.activity_id = p.activity_id
+    LEFT JOIN LATERAL (
+        SELECT AVG(rating)::float AS rating
+        FROM feedback
+        WHERE child_id = p.child_id AND activity_id = p.activity_id AND rating IS NOT NULL
+    ) f ON TRUE
+    WHERE b.status IS DISTINCT FROM 'rejected'
+"""
+
+# popularity stats (_build_cache) of the activities a delta merge touched
+ACTIVITY_POPULARITY_QUERY = """
+    SELECT
+        b.activity_id::text AS activity_id,
+        COALESCE(SUM(f.rating), 0)::float AS rating_sum,
+        COUNT(*) AS bookings
+    FROM bookings b
+    LEFT JOIN (
+        SELECT child_id, activity_id, AVG(rating)::float AS rating
+        FROM feedback
+        WHERE rating IS NOT NULL AND activity_id = ANY(%(activity_ids)s::uuid[])
+        GROUP BY child_id, activity_id
+    ) f ON f.child_id = b.child_id AND f.activity_id = b.activity_id
+    WHERE b.status IS DISTINCT FROM 'rejected' AND b.activity_id = ANY(%(activity_ids)s::uuid[])
+    GROUP BY b.activity_id
+"""
+
+# Recommendation cache misses run here (numpy releases the GIL in the scoring calls).
+_INFERENCE_EXECUTOR = ThreadPoolExecutor(max_workers=INFERENCE_THREADS, thread_name_prefix="ai-infer")
+# concurrent identical cache misses -> one computation (see generate_recommendations)
+_IN_FLIGHT = SingleFlight()
+# set by start_inference_pool when INFERENCE_MODE == "process"
+_INFERENCE_POOL: Optional[InferencePool] = None
+
+# Refresh work (DB loads + matrix build) runs here, never on the event loop.
+# The three refresh queries stream in parallel; the spare worker serves reload/merge work.
+_REFRESH_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ai-refresh")
+
+
+def _confidence(rating):
+    """1 + alpha * rating, for one rating or an array of them."""
+    if isinstance(rating, np.ndarray):
+        return 1.0 + CONFIDENCE_ALPHA * rating
+    return 1.0 + CONFIDENCE_ALPHA * float(rating)
+
+
+def _lookup_table(encoder: Mapping[str, int], as_bytes: bool = False) -> Dict[Any, int]:
+    """
+    Plain dict over an encoder's keys, for bulk encoding. A SortedEncoder is
+    searchsorted over U36 strings, which loses to hashing. as_bytes keys the
+    table by encoded ids, for COPY batches. Build it once per refresh; it is
+    dropped with the refresh.
+    """
+    if isinstance(encoder, dict):
+        sample = next(iter(encoder), None)
+        if sample is None or isinstance(sample, bytes) == as_bytes:
+            return encoder  # already keyed like the ids
+    if hasattr(encoder, "keys_array"):
+        keys, values = encoder.keys_array.tolist(), encoder.values_array.tolist()
+    else:
+        keys, values = list(encoder.keys()), list(encoder.values())
+    if as_bytes:
+        keys = [k.encode() for k in keys]
+    else:
+        keys = [_id_str(k) for k in keys]
+    return dict(zip(keys, values))
+
+
+def _is_bytes(ids: Sequence[Any]) -> bool:
+    return isinstance(ids, np.ndarray) and ids.dtype.kind == "S"
+
+
+def _encode_ids(encoder: Mapping[str, int], ids: Sequence[Any]) -> np.ndarray:
+    """
+    Encoder index per id, -1 where unknown, by C-level dict probes. `encoder` is
+    ideally a _lookup_table already; other mappings are converted on every call.
+    """
+    encoder = _lookup_table(encoder, _is_bytes(ids))
+    if isinstance(ids, np.ndarray):
+        ids = ids.tolist()  # str/bytes keys hash faster than numpy scalars
+    return np.fromiter(map(encoder.get, ids, repeat(-1)), dtype=np.int64, count=len(ids))
+
+
+def interaction_matrix(
+    user_idx: np.ndarray,
+    item_idx: np.ndarray,
+    confidence: np.ndarray,
+    shape: Tuple[int, int],
+) -> csr_matrix:
+    """
+    CSR of summed confidence per (user, item). Pairs are stably sorted and summed
+    in float64 before the float32 cast, so the result doesn't depend on row order.
+    """
+    if not len(user_idx):
+        return csr_matrix(shape, dtype=np.float32)
+
+    key = user_idx.astype(np.int64) * shape[1] + item_idx.astype(np.int64)
+    order = np.argsort(key, kind="stable")
+    key = key[order]
+
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    data = np.add.reduceat(confidence[order].astype(np.float64), starts).astype(np.float32)
+    cells = key[starts]
+
+    index_dtype = np.int32 if len(cells) < 2**31 and shape[1] < 2**31 else np.int64
+    indptr = np.zeros(shape[0] + 1, dtype=index_dtype)
+    np.cumsum(np.bincount(cells // shape[1], minlength=shape[0]), out=indptr[1:])
+    return csr_matrix(((data, (cells % shape[1]).astype(index_dtype), indptr)), shape=shape)
+
+
+def _rank_popular(
+    pop_stats: Dict[str, Tuple[float, int]],
+    activities: ActivityStore,
+) -> List[str]:
+    # sort by (avg_rating desc, count desc)
+    popular = sorted(
+        (kv for kv in pop_stats.items() if kv[1][1] > 0),
+        key=lambda kv: ((kv[1][0] / max(kv[1][1], 1)), kv[1][1]),
+        reverse=True
+    )
+    # keep only activities that exist in meta (and have location if possible)
+    return [
+        aid for aid, _ in popular
+        if activities.row_of(aid) is not None
+    ]
+
+
+def _popularity_rank(activities: ActivityStore, popular_rows: np.ndarray) -> np.ndarray:
+    rank = np.full(len(activities), len(popular_rows), dtype=np.int64)
+    rank[popular_rows] = np.arange(len(popular_rows))
+    return rank
+
+
+def _id_str(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def encode_interactions(
+    batches: Iterable[Dict[str, Sequence[Any]]],
+    child_encoder: Dict[str, int],
+    activity_encoder: Dict[str, int],
+) -> Dict[str, Any]:
+    """
+    Encodes column-wise (child_id, activity_id, rating) batches as they arrive. Only
+    index/rating arrays are kept, plus the raw rows one of the encoders doesn't know
+    ("unknown": (child_id, activity_id, rating, user_idx, item_idx) tuples).
+    """
+    users, items, ratings = [], [], []
+    unknown: List[Tuple[str, str, float, int, int]] = []
+    tables: Dict[bool, Tuple[Dict[Any, int], Dict[Any, int]]] = {}  # as_bytes -> (child, activity) tables
+    for columns in batches:
+        child_ids, activity_ids = columns["child_id"], columns["activity_id"]
+        as_bytes = _is_bytes(child_ids)
+        if as_bytes not in tables:
+            tables[as_bytes] = (_lookup_table(child_encoder, as_bytes), _lookup_table(activity_encoder, as_bytes))
+        child_table, activity_table = tables[as_bytes]
+        user_idx = _encode_ids(child_table, child_ids).astype(np.int32)
+        item_idx = _encode_ids(activity_table, activity_ids).astype(np.int32)
+        rating = np.array(columns["rating"], dtype=np.float64)  # NULL -> NaN
+
+        for pos in np.flatnonzero((user_idx < 0) | (item_idx < 0)).tolist():
+            unknown.append((_id_str(child_ids[pos]), _id_str(activity_ids[pos]),
+                            rating[pos], user_idx[pos], item_idx[pos]))
+        users.append(user_idx)
+        items.append(item_idx)
+        ratings.append(rating)
+
+    return {
+        "user_idx": np.concatenate(users) if users else np.empty(0, dtype=np.int32),
+        "item_idx": np.concatenate(items) if items else np.empty(0, dtype=np.int32),
+        "rating": np.concatenate(ratings) if ratings else np.empty(0, dtype=np.float64),
+        "unknown": unknown,
+    }
+
+
+def _load_children(child_encoder: Dict[str, int]) -> ChildStore:
+    return ChildStore.build(stream_dicts(CHILDREN_QUERY), "child_id", child_encoder)
+
+
+def _load_activities(activity_encoder: Dict[str, int]) -> ActivityStore:
+    return ActivityStore.build(stream_dicts(ACTIVITIES_QUERY), "activity_id", activity_encoder)
+
+
+def _load_interactions(child_encoder: Dict[str, int], activity_encoder: Dict[str, int]) -> Dict[str, Any]:
+    if REFRESH_LOADER == "copy":
+        batches = copy_interaction_batches(BOOKINGS_QUERY)
+    else:
+        batches = (dict(zip(names, zip(*rows))) for names, rows in stream_query(BOOKINGS_QUERY))
+    return encode_interactions(batches, child_encoder, activity_encoder)
+
+
+def _build_cache(
+    child_store: ChildStore,
+    activity_store: ActivityStore,
+    interactions: Dict[str, Any],
+    child_encoder: Dict[str, int],
+    activity_encoder: Dict[str, int],
+) -> Dict[str, Any]:
+    """CPU part of the refresh: popularity list and the CF matrix from encode_interactions output."""
+    user_idx = interactions["user_idx"]
+    item_idx = interactions["item_idx"]
+    ratings = interactions["rating"]
+
+    # ---- build popularity fallback ----
+    # popularity: by avg rating then count (simple + effective); unrated bookings count with 0
+    pop_stats: Dict[str, Tuple[float, int]] = {}  # activity_id -> (sum_rating, count)
+    rated = np.nan_to_num(ratings)
+    known = item_idx >= 0
+    counts = np.bincount(item_idx[known], minlength=activity_store.n_encoded)
+    sums = np.bincount(item_idx[known], weights=rated[known], minlength=activity_store.n_encoded)
+    for i in np.flatnonzero(counts).tolist():
+        pop_stats[activity_store.ids[i]] = (float(sums[i]), int(counts[i]))
+    for _, aid, rating, _, item in interactions["unknown"]:
+        if item < 0:
+            s, c = pop_stats.get(aid, (0.0, 0))
+            pop_stats[aid] = (s + (0.0 if np.isnan(rating) else float(rating)), c + 1)
+
+    popular_activity_ids = _rank_popular(pop_stats, activity_store)
+    popular_rows = activity_store.rows_of(popular_activity_ids)
+
+    built = {
+        "children": child_store,
+        "activities": activity_store,
+        "store_memory_bytes": store_memory_totals(child_store, activity_store),
+        "activity_index": SpatialIndex.build(activity_store),
+        "popularity": pop_stats,
+        "popular_activity_ids": popular_activity_ids,
+        "popular_rows": popular_rows,
+        "popularity_rank": _popularity_rank(activity_store, popular_rows),
+        "matrix": None,
+        "ratings": 0,
+        "cold_interactions": {},
+    }
+
+    # ---- build matrix ----
+    if not len(ratings):
+        # no ratings => no CF matrix; fallback only
+        logger.warning("No bookings with ratings. Matrix not built; fallback will be used.")
+        return built
+
+    # children the model has no factors for (fold-in)
+    cold: Dict[Tuple[str, str], float] = {}
+    for cid, aid, rating, user, item in interactions["unknown"]:
+        if user < 0 and item >= 0 and not np.isnan(rating):
+            cold[(cid, aid)] = cold.get((cid, aid), 0.0) + _confidence(rating)
+    built["cold_interactions"] = _merge_cold_interactions({}, cold, activity_encoder)
+
+    encoded = (user_idx >= 0) & (item_idx >= 0) & ~np.isnan(ratings)
+    confidence = _confidence(ratings[encoded])
+    if not encoded.any():
+        logger.warning("No encodable booking rows. Matrix not built; fallback will be used.")
+        return built
+
+    built["matrix"] = interaction_matrix(
+        user_idx[encoded],
+        item_idx[encoded],
+        confidence,
+        shape=(len(child_encoder), len(activity_encoder))
+    )
+    built["ratings"] = int(encoded.sum())
+    return built
+
+
+def _merge_cold_interactions(
+    current: Dict[str, Tuple[np.ndarray, np.ndarray]],
+    cells: Dict[Tuple[str, str], float],
+    activity_encoder: Dict[str, int],
+) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """
+    current with `cells` set for unencoded children (0 drops a cell). Returns a new
+    dict; only the children in `cells` get new (items, confidence) tuples
+    (FoldInTable keys on identity).
+    """
+    per_child: Dict[str, Dict[int, float]] = {}
+    for (cid, aid), conf in cells.items():
+        item = activity_encoder.get(aid)
+        if item is None:
+            continue
+        items = per_child.get(cid)
+        if items is None:
+            items = per_child[cid] = {}
+            if cid in current:
+                old_items, old_conf = current[cid]
+                items.update(zip(old_items.tolist(), old_conf.tolist()))
+        if conf:
+            items[item] = conf
+        else:
+            items.pop(item, None)
+
+    if not per_child:
+        return current
+
+    merged = dict(current)
+    for cid, items in per_child.items():
+        if not items:
+            merged.pop(cid, None)
+            continue
+        merged[cid] = (
+            np.fromiter(items.keys(), dtype=np.int32, count=len(items)),
+            np.fromiter(items.values(), dtype=np.float32, count=len(items)),
+        )
+    return merged
 
-    columns = [desc[0] for desc in cur.description]
-    rows = [dict(zip(columns, row)) for row in cur.fetchall()]
 
-    cur.close()
-    conn.close()
-    return rows
+def _item_gram(model: Any) -> np.ndarray:
+    """YtY, shared by every fold-in solve against this model."""
+    item_factors = np.asarray(model.item_factors, dtype=np.float64)
+    return item_factors.T @ item_factors
 
 
-async def refresh_ai_cache(force: bool = False) -> None:
+def _precompute_top_k(model: Any, matrix: csr_matrix, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (item idx, score) top-k table for every encoded child, via implicit's batched
+    recommend. Rows shorter than k are padded with -1 / -inf.
+    """
+    n_users = min(matrix.shape[0], model.user_factors.shape[0])
+    k = min(k, model.item_factors.shape[0])
+    model = with_threads(model, BATCH_THREADS)  # served copies stay on the request budget
+
+    top_items = np.full((n_users, k), -1, dtype=np.int32)
+    top_scores = np.full((n_users, k), -np.inf, dtype=np.float32)
+
+    started = time.perf_counter()
+    for start in range(0, n_users, PRECOMPUTE_BATCH_SIZE):
+        users = np.arange(start, min(start + PRECOMPUTE_BATCH_SIZE, n_users))
+        ids, scores = model.recommend(
+            users,
+            matrix[users],
+            N=k,
+            filter_already_liked_items=False
+        )
+        top_items[users, :ids.shape[1]] = ids
+        top_scores[users, :scores.shape[1]] = scores
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        "AI top-%d precomputed for %d children in %.1f ms (%.0f users/sec)",
+        k, n_users, elapsed * 1000, n_users / elapsed if elapsed > 0 else float("inf")
+    )
+    return top_items, top_scores
+
+
+def _item_neighbors(model: Any, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k cosine neighbors of every item (itself excluded). Row blocks of the
+    normalized factors keep the similarity matrix at block x items at a time.
+    """
+    item_factors = np.asarray(model.item_factors, dtype=np.float32)
+    n_items = item_factors.shape[0]
+    norms = np.linalg.norm(item_factors, axis=1, keepdims=True)
+    unit = item_factors / np.maximum(norms, 1e-12)
+    k = min(k, n_items - 1)
+
+    neighbors = np.full((n_items, max(k, 0)), -1, dtype=np.int32)
+    scores = np.full((n_items, max(k, 0)), -np.inf, dtype=np.float32)
+    if k <= 0:
+        return neighbors, scores
+
+    started = time.perf_counter()
+    for start in range(0, n_items, SIMILAR_BLOCK_SIZE):
+        stop = min(start + SIMILAR_BLOCK_SIZE, n_items)
+        sims = unit[start:stop] @ unit.T
+        sims[np.arange(stop - start), np.arange(start, stop)] = -np.inf  # not its own neighbor
+
+        part = np.argpartition(sims, -k, axis=1)[:, -k:]
+        part_sims = np.take_along_axis(sims, part, axis=1)
+        order = np.argsort(-part_sims, axis=1, kind="stable")
+        neighbors[start:stop] = np.take_along_axis(part, order, axis=1)
+        scores[start:stop] = np.take_along_axis(part_sims, order, axis=1)
+
+    logger.info("AI item neighbors (top-%d) computed for %d activities in %.1f ms",
+                k, n_items, (time.perf_counter() - started) * 1000)
+    return neighbors, scores
+
+
+async def refresh_ai_cache(force: bool = False, assets: Optional[ModelAssets] = None) -> None:
     """
     Loads children/activities/bookings from DB and builds the sparse matrix once.
     This is the expensive part. Do it at startup, not per request.
+
+    All blocking work runs on _REFRESH_EXECUTOR, so the event loop keeps
+    serving requests while a refresh is in progress. `assets` (from reload_model)
+    replaces the current model version together with the snapshot built for it.
     """
     # Optional TTL refresh
     if not force and REFRESH_TTL_SECONDS > 0:
@@ -105,299 +704,865 @@ async def refresh_ai_cache(force: bool = False) -> None:
             if time.time() - STATE.last_refresh_ts < REFRESH_TTL_SECONDS:
                 return
 
-        load_assets_once()
-
-        # ---- fetch metadata ----
-        children = fetch_all("""
-            SELECT
-                c.child_id::text AS child_id,
-                EXTRACT(YEAR FROM AGE(c.birthdate))::int AS age,
-                c.gender,
-                c.interests,
-                pr.location_lat AS lat,
-                pr.location_lng AS lng
-            FROM children c
-            JOIN bookings b ON c.child_id = b.child_id
-            JOIN providers pr ON b.provider_id = pr.provider_id
-        """)
-
-        
-        activities = fetch_all("""
-            SELECT
-                a.activity_id::text AS activity_id,
-                a.title AS activity_name,
-                a.type AS category,
-                a.price,
-                a.duration AS duration_hours,
-                a.age_from AS min_age,
-                a.age_to AS max_age,
-                pr.location_lat AS activity_lat,
-                pr.location_lng AS activity_lng
-            FROM activities a
-            JOIN providers pr ON a.provider_id = pr.provider_id
-        """)
-
-        bookings = fetch_all("""
-            SELECT child_id::text AS child_id, activity_id::text AS activity_id
-            FROM bookings
-            
-        """)
-        feedback = fetch_all("""
-            SELECT
-                child_id::text AS child_id,
-                activity_id::text AS activity_id,
-                rating,
-                comment
-            FROM feedback
-            WHERE rating IS NOT NULL
-        """)
-
-
-        # build meta dicts
-        STATE.child_meta = {
-            r["child_id"]: {
-                "age": r.get("age"),
-                "gender": r.get("gender"),
-                "interests": r.get("interests"),
-                "lat": r.get("child_lat"),
-                "lng": r.get("child_lng"),
-            }
-            for r in children
-        }
-
-        STATE.activity_meta = {
-            r["activity_id"]: {
-                "activity_name": r.get("activity_name"),
-                "category": r.get("category"),
-                "price": r.get("price"),
-                "duration_hours": r.get("duration_hours"),
-                "min_age": r.get("min_age"),
-                "max_age": r.get("max_age"),
-                "lat": r.get("activity_lat"),
-                "lng": r.get("activity_lng"),
-            }
-            for r in activities
-        }
-
-        # ---- build popularity fallback ----
-        # popularity: by avg rating then count (simple + effective)
-        pop_stats: Dict[str, Tuple[float, int]] = {}  # activity_id -> (sum_rating, count)
-        for b in bookings:
-            aid = b["activity_id"]
-            rt = float(b.get("rating", 0))
-            s, c = pop_stats.get(aid, (0.0, 0))
-            pop_stats[aid] = (s + rt, c + 1)
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+
+        if assets is None:
+            await loop.run_in_executor(_REFRESH_EXECUTOR, load_assets_once)
+            assets = STATE.assets
+        mark = _observe_refresh("load_assets", started)
+        # pin the assets once so the matrix is built against the same encoders it ships with
+        model = assets.model
+        child_encoder = assets.child_encoder or {}
+        activity_encoder = assets.activity_encoder or {}
+
+        # writes committed so far are in the tables we are about to read; if the
+        # refresh fails they go back to STATE.pending (nothing else would apply them).
+        # Writes queued while the reads run stay pending: the next merge re-reads
+        # those pairs, which sets the value the refresh may already have, never adds.
+        drained = STATE.pending.drain()
+        try:
+            # ---- stream + encode metadata and interactions (in parallel) ----
+            children, activities, interactions = await asyncio.gather(
+                loop.run_in_executor(_REFRESH_EXECUTOR, _load_children, child_encoder),
+                loop.run_in_executor(_REFRESH_EXECUTOR, _load_activities, activity_encoder),
+                loop.run_in_executor(_REFRESH_EXECUTOR, _load_interactions, child_encoder, activity_encoder),
+            )
+            fetched = mark = _observe_refresh("fetch", mark)
+
+            built = await loop.run_in_executor(
+                _REFRESH_EXECUTOR,
+                _build_cache,
+                children,
+                activities,
+                interactions,
+                child_encoder,
+                activity_encoder,
+            )
+            mark = _observe_refresh("build", mark)
+
+            # scores don't depend on the matrix (no filtering / recalculation), only on
+            # the model: reuse the previous table while the model is unchanged
+            prev = STATE.snapshot
+            top_k_items, top_k_scores = None, None
+            if prev.model is model and prev.top_k_items is not None:
+                top_k_items, top_k_scores = prev.top_k_items, prev.top_k_scores
+            elif PRECOMPUTE_TOP_K > 0 and model is not None and built["matrix"] is not None:
+                top_k_items, top_k_scores = await loop.run_in_executor(
+                    _REFRESH_EXECUTOR, run_batch, _precompute_top_k, model, built["matrix"], PRECOMPUTE_TOP_K
+                )
+                mark = _observe_refresh("top_k", mark)
+
+            item_gram = None
+            if prev.model is model and prev.item_gram is not None:
+                item_gram = prev.item_gram
+            elif model is not None:
+                item_gram = await loop.run_in_executor(_REFRESH_EXECUTOR, run_batch, _item_gram, model)
+                mark = _observe_refresh("item_gram", mark)
+
+            item_neighbors, item_neighbor_scores = None, None
+            if prev.model is model and prev.item_neighbors is not None:
+                item_neighbors, item_neighbor_scores = prev.item_neighbors, prev.item_neighbor_scores
+            elif SIMILAR_TOP_K > 0 and model is not None:
+                item_neighbors, item_neighbor_scores = await loop.run_in_executor(
+                    _REFRESH_EXECUTOR, run_batch, _item_neighbors, model, SIMILAR_TOP_K
+                )
+                mark = _observe_refresh("item_neighbors", mark)
+            finished = time.perf_counter()
+            REFRESH_STAGE_SECONDS.observe(finished - started, stage="total")
+
+            snapshot = AISnapshot(
+                version=STATE.snapshot.version + 1,
+                refresh_version=STATE.snapshot.refresh_version + 1,
+                built_ts=time.time(),
+                model_version=assets.version,
+                model_source=assets.source,
+                model=model,
+                quantized=assets.quantized,
+                child_encoder=child_encoder,
+                activity_encoder=activity_encoder,
+                matrix=built["matrix"],
+                children=built["children"],
+                activities=built["activities"],
+                store_memory_bytes=built["store_memory_bytes"],
+                popularity=built["popularity"],
+                popular_activity_ids=tuple(built["popular_activity_ids"]),
+                popular_rows=built["popular_rows"],
+                popularity_rank=built["popularity_rank"],
+                activity_index=built["activity_index"],
+                top_k_items=top_k_items,
+                top_k_scores=top_k_scores,
+                cold_interactions=built["cold_interactions"],
+                item_gram=item_gram,
+                item_neighbors=item_neighbors,
+                item_neighbor_scores=item_neighbor_scores,
+            )
+            # no await in between: requests see old assets + old snapshot or new + new
+            STATE.assets = assets
+            STATE.publish(snapshot)
+        except BaseException:
+            STATE.pending.restore(drained)
+            raise
+
+        if SNAPSHOT_DIR:
+            mark = time.perf_counter()
+            await loop.run_in_executor(_REFRESH_EXECUTOR, _save_snapshot, snapshot, assets)
+            _observe_refresh("save_snapshot", mark)
 
-        # sort by (avg_rating desc, count desc)
-        popular = sorted(
-            pop_stats.items(),
-            key=lambda kv: ((kv[1][0] / max(kv[1][1], 1)), kv[1][1]),
-            reverse=True
+        logger.info(
+            "AI cache refreshed in %.1f ms (fetch=%.1f ms build=%.1f ms): "
+            "version=%d children=%d activities=%d ratings=%d matrix_nnz=%d cold_children=%d",
+            (finished - started) * 1000,
+            (fetched - started) * 1000,
+            (finished - fetched) * 1000,
+            snapshot.version,
+            snapshot.children.count,
+            snapshot.activities.count,
+            built["ratings"],
+            snapshot.matrix.nnz if snapshot.matrix is not None else 0,
+            len(snapshot.cold_interactions)
         )
-        # keep only activities that exist in meta (and have location if possible)
-        STATE.popular_activity_ids = [
-            aid for aid, _ in popular
-            if aid in STATE.activity_meta
-        ]
-
-        # ---- build matrix ----
-        if not bookings:
-            # no ratings => no CF matrix; fallback only
-            STATE.matrix = None
-            STATE.last_refresh_ts = time.time()
-            logger.warning("No bookings with ratings. Matrix not built; fallback will be used.")
-            return
 
-        child_encoder = STATE.child_encoder or {}
-        activity_encoder = STATE.activity_encoder or {}
 
-        # encode rows
-        user_idx = []
-        item_idx = []
-        confidence = []
+def _observe_refresh(stage: str, since: float) -> float:
+    now = time.perf_counter()
+    REFRESH_STAGE_SECONDS.observe(now - since, stage=stage)
+    return now
 
-        alpha = 40.0
 
-        for b in bookings:
-            cid = b["child_id"]
-            aid = b["activity_id"]
-            r = b["rating"]
+def _save_snapshot(snapshot: AISnapshot, assets: ModelAssets) -> None:
+    # best effort: a failed save only costs the next worker start its warm snapshot
+    try:
+        started = time.perf_counter()
+        manifest = save_snapshot(snapshot, assets, SNAPSHOT_DIR)
+        logger.info("AI snapshot saved to %s in %.1f ms (%d bytes)",
+                    SNAPSHOT_DIR, (time.perf_counter() - started) * 1000, manifest["bytes"])
+    except Exception:
+        AI_EXCEPTIONS.inc(operation="snapshot_save")
+        logger.exception("Saving the AI snapshot to %s failed", SNAPSHOT_DIR)
 
-            if cid not in child_encoder or aid not in activity_encoder:
-                continue
-            if r is None:
-                continue
 
-            u = child_encoder[cid]
-            i = activity_encoder[aid]
-            conf = 1.0 + alpha * float(r)
+async def restore_snapshot() -> bool:
+    """
+    Startup path: publishes the snapshot the last refresh saved for the current
+    assets, without touching the DB. Returns False (nothing published) when there
+    is no usable one; the caller then refreshes as usual.
+    """
+    if not SNAPSHOT_DIR:
+        return False
 
-            user_idx.append(u)
-            item_idx.append(i)
-            confidence.append(conf)
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    async with STATE.refresh_lock:
+        if STATE.snapshot.version:
+            return False  # a refresh got there first
+        await loop.run_in_executor(_REFRESH_EXECUTOR, load_assets_once)
+        assets = STATE.assets
+        try:
+            restored = await loop.run_in_executor(
+                _REFRESH_EXECUTOR, load_snapshot, assets, SNAPSHOT_DIR, SNAPSHOT_MAX_AGE_SECONDS
+            )
+        except Exception:
+            AI_EXCEPTIONS.inc(operation="snapshot_restore")
+            logger.exception("AI snapshot in %s unreadable; refreshing from the DB", SNAPSHOT_DIR)
+            return False
+        if restored is None:
+            return False
 
-        if not user_idx:
-            STATE.matrix = None
-            STATE.last_refresh_ts = time.time()
-            logger.warning("No encodable booking rows. Matrix not built; fallback will be used.")
-            return
+        snapshot, manifest = restored
+        STATE.publish(dataclasses.replace(snapshot, version=1, refresh_version=1))
 
-        user_idx = np.array(user_idx, dtype=np.int32)
-        item_idx = np.array(item_idx, dtype=np.int32)
-        confidence = np.array(confidence, dtype=np.float32)
+    logger.info("AI snapshot restored from %s in %.1f ms: built %s, model version=%s, matrix_nnz=%d",
+                snapshot.restored_from,
+                (time.perf_counter() - started) * 1000,
+                manifest.get("created_at"),
+                assets.version,
+                manifest.get("matrix_nnz", 0))
+    return True
 
-        STATE.matrix = csr_matrix(
-            (confidence, (user_idx, item_idx)),
-            shape=(len(child_encoder), len(activity_encoder))
-        )
 
-        STATE.last_refresh_ts = time.time()
+# =========================
+# Inference process pool (INFERENCE_MODE == "process")
+# =========================
+async def start_inference_pool() -> None:
+    """Called from main.py's lifespan; a no-op in thread mode."""
+    global _INFERENCE_POOL
+    if INFERENCE_MODE != "process" or _INFERENCE_POOL is not None:
+        return
+    pool = InferencePool(INFERENCE_PROCESSES, blas_threads=REQUEST_THREADS, timeout=INFERENCE_TIMEOUT_SECONDS)
+    source = STATE.snapshot.model_source
+    await asyncio.get_running_loop().run_in_executor(
+        _REFRESH_EXECUTOR, pool.warm, source if pool.can_score(source) else None
+    )
+    if not pool.can_score(source):
+        logger.warning("AI inference mode is 'process' but the model (%s) isn't an artifact directory; "
+                       "scoring stays in-process until one is loaded", source)
+    _INFERENCE_POOL = pool
+
+
+def stop_inference_pool() -> None:
+    global _INFERENCE_POOL
+    if _INFERENCE_POOL is not None:
+        _INFERENCE_POOL.shutdown()
+        _INFERENCE_POOL = None
+
+
+# =========================
+# Model hot-swap
+# =========================
+_RELOAD_TASK: Optional[asyncio.Task] = None
+
+
+async def reload_model(version: Optional[str] = None) -> ModelAssets:
+    """
+    Loads + validates a model version (default: the registry's LATEST) off the
+    event loop, then swaps it in with a full refresh. In-flight requests finish on
+    the snapshot they pinned; on any failure the current model keeps serving.
+    """
+    loop = asyncio.get_running_loop()
+    STATE.last_reload = {"status": "loading", "requested": version, "started_ts": time.time()}
+    try:
+        assets = await loop.run_in_executor(_REFRESH_EXECUTOR, _load_assets, version)
+        await refresh_ai_cache(force=True, assets=assets)
+    except Exception as e:
+        AI_EXCEPTIONS.inc(operation="reload")
+        STATE.last_reload = {**STATE.last_reload, "status": "failed", "error": str(e), "finished_ts": time.time()}
+        raise
+
+    STATE.last_reload = {
+        **STATE.last_reload,
+        "status": "ok",
+        "version": assets.version,
+        "load_ms": assets.load_ms,
+        "finished_ts": time.time(),
+    }
+    return assets
+
+
+def start_model_reload(version: Optional[str] = None) -> bool:
+    """Runs reload_model in the background; False if a reload is already running."""
+    global _RELOAD_TASK
+    if _RELOAD_TASK is not None and not _RELOAD_TASK.done():
+        return False
+
+    async def run():
+        try:
+            await reload_model(version)
+        except Exception:
+            logger.exception("AI model reload failed (version=%s); keeping version=%s",
+                             version, STATE.snapshot.model_version)
+
+    _RELOAD_TASK = asyncio.get_running_loop().create_task(run())
+    return True
+
+
+# =========================
+# Incremental updates (booking / feedback writes)
+# =========================
+def record_booking(child_id: str, activity_id: str, removed: bool = False) -> None:
+    """
+    Call after a booking is committed (removed=True for rejected/deleted bookings).
+    The merge re-reads the pair, so both cases queue the same thing.
+    """
+    STATE.pending.add(str(child_id), str(activity_id))
+    STATE.results.invalidate_child(str(child_id))
+
+
+def record_feedback(child_id: str, activity_id: str, rating: Optional[float]) -> None:
+    """Call after a rated feedback row is committed."""
+    if rating is None:
+        return
+    STATE.pending.add(str(child_id), str(activity_id))
+    STATE.results.invalidate_child(str(child_id))
+
+
+def _read_pairs(
+    pairs: Set[Tuple[str, str]],
+) -> Tuple[Dict[Tuple[str, str], float], Dict[str, Tuple[float, int]]]:
+    """
+    Current matrix cells of `pairs` and popularity stats of their activities, with
+    the refresh's semantics: one cell per booking, weighted by the pair's average
+    rating. Pairs without a rated booking are absent from the cells.
+    """
+    child_ids, activity_ids = (list(ids) for ids in zip(*pairs))
+    cells: Dict[Tuple[str, str], float] = {}
+    for _, rows in stream_query(
+        PAIR_BOOKINGS_QUERY, {"child_ids": child_ids, "activity_ids": activity_ids}
+    ):
+        for cid, aid, rating in rows:
+            if rating is not None:
+                cells[(cid, aid)] = cells.get((cid, aid), 0.0) + _confidence(rating)
+
+    popularity: Dict[str, Tuple[float, int]] = {}
+    for _, rows in stream_query(ACTIVITY_POPULARITY_QUERY, {"activity_ids": sorted(set(activity_ids))}):
+        for aid, rating_sum, bookings in rows:
+            popularity[aid] = (float(rating_sum), int(bookings))
+    return cells, popularity
+
+
+def _apply_delta(
+    snap: AISnapshot,
+    pairs: Set[Tuple[str, str]],
+    cells: Dict[Tuple[str, str], float],
+    pop_stats: Dict[str, Tuple[float, int]],
+) -> AISnapshot:
+    """
+    New snapshot = snap with the cells of `pairs` and the popularity of their
+    activities replaced by _read_pairs' values. Cost grows with the delta, not the tables.
+    """
+    matrix = snap.matrix
+    child_encoder = snap.child_encoder or {}
+    activity_encoder = snap.activity_encoder or {}
+
+    encoded = [
+        (child_encoder[cid], activity_encoder[aid], cells.get((cid, aid), 0.0))
+        for cid, aid in pairs
+        if cid in child_encoder and aid in activity_encoder
+    ]
+    if encoded:
+        user_idx, item_idx, confidence = (np.array(col) for col in zip(*encoded))
+        user_idx, item_idx = user_idx.astype(np.int32), item_idx.astype(np.int32)
+        shape = (len(child_encoder), len(activity_encoder))
+        if matrix is None:
+            matrix = csr_matrix(shape, dtype=np.float32)
+        current = np.asarray(matrix[user_idx, item_idx], dtype=np.float32).ravel()
+        delta = csr_matrix((confidence.astype(np.float32) - current, (user_idx, item_idx)), shape=shape)
+        matrix = (matrix + delta).tocsr()
+        matrix.eliminate_zeros()  # cells of removed bookings
+
+    cold_interactions = _merge_cold_interactions(
+        snap.cold_interactions,
+        {pair: cells.get(pair, 0.0) for pair in pairs if pair[0] not in child_encoder},
+        activity_encoder,
+    )
+
+    popularity = dict(snap.popularity)
+    for aid in {aid for _, aid in pairs}:
+        if aid in pop_stats:
+            popularity[aid] = pop_stats[aid]
+        else:
+            popularity.pop(aid, None)
+    popular_activity_ids = snap.popular_activity_ids
+    popular_rows = snap.popular_rows
+    popularity_rank = snap.popularity_rank
+    if snap.activities is not None:
+        popular_activity_ids = tuple(_rank_popular(popularity, snap.activities))
+        popular_rows = snap.activities.rows_of(popular_activity_ids)
+        popularity_rank = _popularity_rank(snap.activities, popular_rows)
+
+    return dataclasses.replace(
+        snap,
+        version=snap.version + 1,
+        built_ts=time.time(),
+        matrix=matrix,
+        cold_interactions=cold_interactions,
+        popularity=popularity,
+        popular_activity_ids=popular_activity_ids,
+        popular_rows=popular_rows,
+        popularity_rank=popularity_rank,
+    )
+
+
+def _merge_pairs(snap: AISnapshot, pairs: Set[Tuple[str, str]]) -> AISnapshot:
+    cells, pop_stats = _read_pairs(pairs)
+    return _apply_delta(snap, pairs, cells, pop_stats)
+
+
+async def merge_pending_interactions() -> None:
+    """Fold buffered booking/feedback writes into a new snapshot by re-reading just their pairs."""
+    if not len(STATE.pending):
+        return
+
+    async with STATE.refresh_lock:
+        snap = STATE.snapshot
+        if not snap.version:
+            return  # nothing to merge into yet; the first full refresh will read the writes
+
+        pairs = STATE.pending.drain()
+        if not pairs:
+            return
+
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            merged = await loop.run_in_executor(_REFRESH_EXECUTOR, _merge_pairs, snap, pairs)
+        except BaseException:
+            STATE.pending.restore(pairs)
+            raise
+        STATE.publish(merged)
+        # the writes invalidated these children's results, but requests in between
+        # recomputed (and re-cached) them from the previous snapshot; merges keep
+        # refresh_version, so those entries would outlive the merge
+        for child_id in {cid for cid, _ in pairs}:
+            STATE.results.invalidate_child(child_id)
         logger.info(
-            "AI cache refreshed: children=%d activities=%d ratings=%d matrix_nnz=%d",
-            len(STATE.child_meta),
-            len(STATE.activity_meta),
-            len(user_idx),
-            STATE.matrix.nnz if STATE.matrix is not None else 0
+            "AI delta merged in %.1f ms: version=%d pairs=%d",
+            (time.perf_counter() - started) * 1000,
+            merged.version,
+            len(pairs)
         )
 
 
+# =========================
+# Background refresh (stale-while-revalidate)
+# =========================
+def request_refresh() -> None:
+    """Ask the background refresher to run soon. Never waits for the refresh."""
+    STATE.refresh_requested.set()
+
+
+def _next_refresh_delay(failed: bool = False) -> Optional[float]:
+    # a failed full refresh is retried even without a TTL: the snapshot being served
+    # may be a restored one (ai_persist), up to SNAPSHOT_MAX_AGE_SECONDS old
+    if failed or not STATE.snapshot.version:
+        return REFRESH_RETRY_SECONDS
+    if REFRESH_TTL_SECONDS <= 0:
+        return None  # only on request_refresh()
+    jitter = random.uniform(-REFRESH_JITTER_SECONDS, REFRESH_JITTER_SECONDS)
+    return max(1.0, REFRESH_TTL_SECONDS + jitter)
+
+
+async def run_refresh_loop() -> None:
+    """
+    Keeps STATE.snapshot fresh for the lifetime of the app (started from main.py's lifespan).
+    Requests keep reading the last published snapshot while a refresh runs; a failed
+    refresh leaves that snapshot in place. Between full refreshes, pending writes are
+    merged every DELTA_MERGE_SECONDS.
+
+    After a failed full refresh, request_refresh() calls wait for the scheduled
+    retry: cold-snapshot traffic requests one per request and must not bypass
+    REFRESH_RETRY_SECONDS.
+    """
+    delay = _next_refresh_delay()
+    next_full = None if delay is None else time.monotonic() + delay
+    backoff_until = 0.0
+
+    # registry LATEST as last seen; a change (e.g. ai_train finished) reloads every worker
+    watch = MODEL_WATCH_SECONDS > 0 and not ARTIFACT_DIR
+    seen_latest = latest_version() if watch else None
+    next_watch = time.monotonic() + MODEL_WATCH_SECONDS
+
+    while True:
+        timeout = DELTA_MERGE_SECONDS
+        if next_full is not None:
+            timeout = min(timeout, max(0.0, next_full - time.monotonic()))
+        try:
+            await asyncio.wait_for(STATE.refresh_requested.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+        requested = STATE.refresh_requested.is_set()
+        if requested and time.monotonic() < backoff_until:
+            STATE.refresh_requested.clear()  # the retry at next_full covers it
+            requested = False
+        full = requested or (next_full is not None and time.monotonic() >= next_full)
+        failed = False
+        try:
+            if full:
+                STATE.refresh_requested.clear()
+                await refresh_ai_cache(force=True)
+            else:
+                await merge_pending_interactions()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            failed = True
+            AI_EXCEPTIONS.inc(operation="refresh" if full else "merge")
+            logger.exception("Background AI refresh failed; serving snapshot version=%d",
+                             STATE.snapshot.version)
+        finally:
+            if full:
+                delay = _next_refresh_delay(failed)
+                next_full = None if delay is None else time.monotonic() + delay
+                backoff_until = time.monotonic() + REFRESH_RETRY_SECONDS if failed else 0.0
+
+        if watch and time.monotonic() >= next_watch:
+            next_watch = time.monotonic() + MODEL_WATCH_SECONDS
+            latest = latest_version()
+            if latest is not None and latest != seen_latest:
+                seen_latest = latest
+                logger.info("AI model registry LATEST -> %s (%s); reloading", latest, REGISTRY_DIR)
+                try:
+                    await reload_model(latest)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.exception("AI model reload failed (version=%s); keeping version=%s",
+                                     latest, STATE.snapshot.model_version)
+
+
 # =========================
 # Fallback recommendations (cold start)
 # =========================
-def _fallback_recommendations(child_id: str, limit: int = 10) -> List[Dict[str, Any]]:
-    child = STATE.child_meta.get(child_id, {})
-    child_lat = child.get("lat") or 0.0
-    child_lng = child.get("lng") or 0.0
-    child_age = child.get("age")
+def _child_location_and_age(snap: AISnapshot, child_id: str) -> Tuple[float, float, Optional[float]]:
+    if snap.children is None:
+        return 0.0, 0.0, None
+    return snap.children.location_and_age(child_id)
 
-    results = []
 
-    # If we have popularity list, use it; else just any activities
-    candidates = STATE.popular_activity_ids or list(STATE.activity_meta.keys())
+def _fallback_recommendations(snap: AISnapshot, child_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+    RECOMMENDATIONS.inc(source="fallback")
+    with RECOMMEND_STAGE_SECONDS.time(stage="fallback"):
+        return _nearest_popular(snap, child_id, limit)
 
-    for aid in candidates:
-        meta = STATE.activity_meta.get(aid)
-        if not meta:
-            continue
 
-        # age filter if available
-        min_age = meta.get("min_age")
-        max_age = meta.get("max_age")
-        if child_age is not None and min_age is not None and max_age is not None:
-            try:
-                if not (int(min_age) <= int(child_age) <= int(max_age)):
-                    continue
-            except Exception:
-                pass
-
-        dist = calc_distance(
-            float(child_lat or 0.0),
-            float(child_lng or 0.0),
-            float(meta.get("lat") or 0.0),
-            float(meta.get("lng") or 0.0),
-        )
+def _nearest_popular(snap: AISnapshot, child_id: str, limit: int) -> List[Dict[str, Any]]:
+    store = snap.activities
+    index = snap.activity_index
+    if store is None or index is None or not len(index):
+        return []
 
-        results.append({
-            "activity_id": aid,
-            "activity_name": meta.get("activity_name"),
-            "score": 0.0,  # fallback doesn't have CF score
-            "distance_km": round(dist, 2),
-            "category": meta.get("category"),
-            "price": float(meta.get("price") or 0.0),
-            "duration_hours": int(meta.get("duration_hours") or 0),
-            "min_age": int(meta.get("min_age") or 0),
-            "max_age": int(meta.get("max_age") or 99),
-            "lat": float(meta.get("lat") or 0.0),
-            "lng": float(meta.get("lng") or 0.0),
-            "source": "fallback"
-        })
-
-        if len(results) >= max(limit * 3, 50):  # collect enough to sort
-            break
-
-    # nearest first
-    results.sort(key=lambda x: x["distance_km"])
-    return results[:limit]
+    child_lat, child_lng, child_age = _child_location_and_age(snap, child_id)
+
+    # nearest activities that accept the child's age (if known), popular or not
+    rows = index.nearest(
+        child_lat, child_lng, limit,
+        accept=lambda r: age_mask(store, r, child_age)
+    )
+
+    # nearest first (ties go to the more popular activity)
+    rows, scores, dist = rank_by_distance(
+        store, rows, np.zeros(len(rows)), child_lat, child_lng, limit,
+        tiebreak=snap.popularity_rank[rows]
+    )
+    return to_results(store, rows, scores, dist, "fallback")
 
 
 # =========================
 # Main API: Generate Recommendations
 # =========================
-async def generate_recommendations(child_id: str, limit: int = 10) -> List[Dict[str, Any]]:
-    try:
-        # ensure caches are ready (startup should do this, but this is a safety net)
-        if STATE.model is None or STATE.child_encoder is None or STATE.activity_encoder is None:
-            load_assets_once()
+def _als_candidates(snap: AISnapshot, user_idx: int, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-n ALS items for one child: precomputed table when it is deep enough, else the model."""
+    table = snap.top_k_items
+    if table is not None and user_idx < table.shape[0] and n <= table.shape[1]:
+        ids = table[user_idx, :n]
+        keep = ids >= 0
+        return ids[keep], snap.top_k_scores[user_idx, :n][keep]
+
+    if _INFERENCE_POOL is not None and _INFERENCE_POOL.can_score(snap.model_source):
+        return _INFERENCE_POOL.score_user(snap.model_source, user_idx, n)
+
+    if snap.quantized is not None:
+        return snap.quantized.recommend_user(user_idx, n)
+
+    return snap.model.recommend(
+        user_idx,
+        snap.matrix[user_idx],
+        N=n,
+        filter_already_liked_items=False
+    )
+
+
+def _als_candidates_batch(
+    snap: AISnapshot,
+    user_idx: Sequence[int],
+    n: int,
+) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """_als_candidates for many children: table rows, or one batched model call."""
+    users = np.asarray(user_idx, dtype=np.int64)
+    table = snap.top_k_items
+    if table is not None and n <= table.shape[1] and users.max() < table.shape[0]:
+        ids = table[users, :n]
+        scores = snap.top_k_scores[users, :n]
+        return [(i[i >= 0], sc[i >= 0]) for i, sc in zip(ids, scores)]
+
+    if _INFERENCE_POOL is not None and _INFERENCE_POOL.can_score(snap.model_source):
+        ids, scores = _INFERENCE_POOL.score_users(snap.model_source, users, n)
+    elif snap.quantized is not None:
+        ids, scores = snap.quantized.recommend_users(users, n)
+    else:
+        ids, scores = snap.model.recommend(
+            users,
+            snap.matrix[users],
+            N=n,
+            filter_already_liked_items=False
+        )
+    return list(zip(ids, scores))
 
-        if STATE.matrix is None or not STATE.activity_meta:
-            # try refresh once (non-force) then fallback
-            await refresh_ai_cache(force=False)
 
-        # cold-start cases -> fallback
-        if not STATE.child_encoder or child_id not in STATE.child_encoder:
-            return _fallback_recommendations(child_id, limit)
+def _fold_in(snap: AISnapshot, child_id: str) -> Optional[np.ndarray]:
+    """
+    User factor for a child the model wasn't trained on, from their current
+    interactions: the closed-form ALS user step against the fixed item factors,
+        x = (YtY + Yᵀ(Cu - I)Y + λI)⁻¹ Yᵀ Cu p(u)
+    Cached in STATE.fold_in until the child's interactions or the model change.
+    """
+    source = snap.cold_interactions.get(child_id)
+    if source is None or snap.item_gram is None:
+        return None
+
+    cached = STATE.fold_in.get(child_id, source)
+    if cached is not None:
+        return cached
+
+    items, confidence = source
+    y = np.asarray(snap.model.item_factors, dtype=np.float64)
+    keep = items < y.shape[0]
+    y_u = y[items[keep]]
+    c_u = confidence[keep].astype(np.float64)
+    if not len(y_u):
+        return None
+
+    a = snap.item_gram + (y_u.T * (c_u - 1.0)) @ y_u
+    a[np.diag_indices_from(a)] += getattr(snap.model, "regularization", 0.01)
+    vector = np.linalg.solve(a, y_u.T @ c_u).astype(np.float32)
+
+    STATE.fold_in.put(child_id, source, vector)
+    return vector
+
+
+def _fold_in_candidates(snap: AISnapshot, vector: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    if _INFERENCE_POOL is not None and _INFERENCE_POOL.can_score(snap.model_source):
+        return _INFERENCE_POOL.score_vector(snap.model_source, vector, n)
+
+    if snap.quantized is not None:
+        return snap.quantized.recommend_vector(vector, n)
+
+    scores = np.asarray(snap.model.item_factors) @ vector
+    n = min(n, len(scores))
+    part = np.argpartition(-scores, n - 1)[:n] if n < len(scores) else np.arange(len(scores))
+    order = np.argsort(-scores[part], kind="stable")
+    return part[order], scores[part][order]
+
+
+def _rank_als(
+    snap: AISnapshot,
+    child_id: str,
+    item_ids: np.ndarray,
+    item_scores: np.ndarray,
+    limit: int,
+    distance_of: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+) -> List[Dict[str, Any]]:
+    child_lat, child_lng, _ = _child_location_and_age(snap, child_id)
+
+    store = snap.activities
+    rows = np.asarray(item_ids, dtype=np.int64)
+    item_scores = np.asarray(item_scores, dtype=np.float64)
+
+    # ALS idx == metadata row; items without metadata are dropped
+    keep = (rows >= 0) & (rows < store.n_encoded)
+    keep[keep] = store.present[rows[keep]]
+    cap = max(limit * 3, 50)
+    rows, item_scores = rows[keep][:cap], item_scores[keep][:cap]
+
+    # sort by nearest then score (مثل منطقك بس بدون ما نقتل السيرفر)
+    with RECOMMEND_STAGE_SECONDS.time(stage="rank"):
+        rows, item_scores, dist = rank_by_distance(
+            store, rows, item_scores, child_lat, child_lng, limit,
+            dist=distance_of(rows) if distance_of is not None else None
+        )
+    with RECOMMEND_STAGE_SECONDS.time(stage="enrich"):
+        return to_results(store, rows, item_scores, dist, "als")
 
-        if STATE.matrix is None:
-            return _fallback_recommendations(child_id, limit)
 
-        user_idx = STATE.child_encoder[child_id]
+def _recommend(snap: AISnapshot, child_id: str, limit: int) -> List[Dict[str, Any]]:
+    if snap.matrix is None:
+        return _fallback_recommendations(snap, child_id, limit)
 
+    n = max(50, limit * 5)
+    user_idx = snap.child_encoder.get(child_id) if snap.child_encoder else None
+    if user_idx is not None:
         # Recommend top N then enrich metadata + distance
-        recs = STATE.model.recommend(
-            user_idx,
-            STATE.matrix[user_idx],
-            N=max(50, limit * 5),
-            filter_already_liked_items=False
-        )
+        with RECOMMEND_STAGE_SECONDS.time(stage="candidates"):
+            item_ids, item_scores = _als_candidates(snap, user_idx, n)
+        source = "als"
+    else:
+        # not in the trained model: fold in from the child's own interactions
+        with RECOMMEND_STAGE_SECONDS.time(stage="fold_in"):
+            vector = _fold_in(snap, child_id)
+            if vector is not None:
+                item_ids, item_scores = _fold_in_candidates(snap, vector, n)
+        if vector is None:
+            # cold-start (no interactions either) -> fallback
+            return _fallback_recommendations(snap, child_id, limit)
+        source = "fold_in"
+
+    results = _rank_als(snap, child_id, item_ids, item_scores, limit)
+    RECOMMENDATIONS.inc(source=source)
+    return results
+
+
+def _recommend_batch(snap: AISnapshot, child_ids: List[str], limit: int) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    _recommend for several children (typically siblings): one candidate call for
+    all encoded children, one haversine pass per distinct home location.
+    """
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    encoded: List[Tuple[str, int]] = []
+    for child_id in child_ids:
+        user_idx = snap.child_encoder.get(child_id) if snap.child_encoder else None
+        if user_idx is None or snap.matrix is None:
+            results[child_id] = _recommend(snap, child_id, limit)  # fold-in / fallback
+        else:
+            encoded.append((child_id, user_idx))
+    if not encoded:
+        return results
+
+    store = snap.activities
+    with RECOMMEND_STAGE_SECONDS.time(stage="candidates_batch"):
+        candidates = _als_candidates_batch(snap, [idx for _, idx in encoded], max(50, limit * 5))
+
+    # siblings share the parent's location: their candidates share one distance vector
+    by_location: Dict[Tuple[float, float], List[Tuple[str, np.ndarray, np.ndarray]]] = {}
+    for (child_id, _), (ids, scores) in zip(encoded, candidates):
+        lat, lng, _ = _child_location_and_age(snap, child_id)
+        by_location.setdefault((lat, lng), []).append((child_id, ids, scores))
+
+    for (lat, lng), group in by_location.items():
+        union = np.unique(np.concatenate([np.asarray(ids, dtype=np.int64) for _, ids, _ in group]))
+        union = union[(union >= 0) & (union < len(store))]
+        union_dist = haversine_km(lat, lng, store.lat[union], store.lng[union])
+
+        def distance_of(rows, union=union, union_dist=union_dist):
+            return union_dist[np.searchsorted(union, rows)]
+
+        for child_id, ids, scores in group:
+            results[child_id] = _rank_als(snap, child_id, ids, scores, limit, distance_of)
+    RECOMMENDATIONS.inc(len(encoded), source="als")
+    return results
 
-        child = STATE.child_meta.get(child_id, {})
-        child_lat = float(child.get("lat") or 0.0)
-        child_lng = float(child.get("lng") or 0.0)
 
-        results: List[Dict[str, Any]] = []
-        reverse_map = STATE.reverse_activity_map or {}
+# =========================
+# Similar activities (item-item)
+# =========================
+def similar_activities(
+    activity_id: str,
+    limit: int = 10,
+    age: Optional[float] = None,
+    child_id: Optional[str] = None,
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Activities closest to `activity_id` in item-factor space, from the neighbor
+    table built at refresh. `age` (or the age of `child_id`) keeps only activities
+    whose age band accepts it. None if the activity is unknown.
+    """
+    snap = STATE.snapshot
+    store = snap.activities
+    if store is None:
+        return None
+    row = store.row_of(activity_id)
+    if row is None:
+        return None
 
-        for item_idx, score in recs:
-            item_idx = int(item_idx)
-            score = float(score)
+    table = snap.item_neighbors
+    if table is None or row >= table.shape[0]:
+        return []  # no factors for this activity (added after training)
 
-            if item_idx not in reverse_map:
-                continue
+    rows = table[row].astype(np.int64)
+    scores = snap.item_neighbor_scores[row]
+    keep = (rows >= 0) & (rows < store.n_encoded)
+    keep[keep] = store.present[rows[keep]]
+    rows, scores = rows[keep], scores[keep]
 
-            aid = reverse_map[item_idx]
-            meta = STATE.activity_meta.get(aid)
-            if not meta:
-                continue
+    if age is None and child_id is not None:
+        _, _, age = _child_location_and_age(snap, child_id)
+    if age is not None:
+        keep = age_mask(store, rows, age)
+        rows, scores = rows[keep], scores[keep]
 
-            dist = calc_distance(
-                child_lat, child_lng,
-                float(meta.get("lat") or 0.0),
-                float(meta.get("lng") or 0.0),
-            )
+    return to_results(store, rows[:limit], scores[:limit], None, "similar")
 
-            results.append({
-                "activity_id": aid,
-                "activity_name": meta.get("activity_name"),
-                "score": score,
-                "distance_km": round(dist, 2),
-                "category": meta.get("category"),
-                "price": float(meta.get("price") or 0.0),
-                "duration_hours": int(meta.get("duration_hours") or 0),
-                "min_age": int(meta.get("min_age") or 0),
-                "max_age": int(meta.get("max_age") or 99),
-                "lat": float(meta.get("lat") or 0.0),
-                "lng": float(meta.get("lng") or 0.0),
-                "source": "als"
-            })
-
-            if len(results) >= max(limit * 3, 50):
-                break
-
-        # sort by nearest then score (مثل منطقك بس بدون ما نقتل السيرفر)
-        results.sort(key=lambda x: (x["distance_km"], -x["score"]))
-        return results[:limit]
 
+async def generate_recommendations(child_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+    with RECOMMEND_STAGE_SECONDS.time(stage="total"):
+        # pin one snapshot for the whole request; a concurrent refresh publishes a new one
+        snap = STATE.snapshot
+        if not snap.version:
+            # cold cache: let the background refresher catch up, answer with what we have
+            request_refresh()
+            return _fallback_recommendations(snap, child_id, limit)
+
+        key = (child_id, limit, snap.refresh_version)
+        cached = STATE.results.get(key)
+        if cached is not None:
+            RECOMMENDATIONS.inc(source="cache")
+            return list(cached)
+
+        # cache miss: compute off the event loop; identical requests arriving meanwhile
+        # (same child, limit and snapshot) wait for this computation instead of repeating it
+        results = await _run_inference((child_id, limit, snap.version), _compute_recommendations, snap, child_id, limit)
+        return list(results)
+
+
+async def _run_inference(flight_key: Tuple[Any, ...], fn: Callable[..., Any], *args: Any) -> Any:
+    """fn(*args) on _INFERENCE_EXECUTOR, coalesced on flight_key; AIOverloaded past INFERENCE_MAX_PENDING."""
+    if flight_key not in _IN_FLIGHT and len(_IN_FLIGHT) >= INFERENCE_MAX_PENDING:
+        REJECTED.inc()
+        raise AIOverloaded(f"{len(_IN_FLIGHT)} recommendations already in flight")
+
+    loop = asyncio.get_running_loop()
+    result, shared = await _IN_FLIGHT.do(flight_key, lambda: loop.run_in_executor(_INFERENCE_EXECUTOR, fn, *args))
+    if shared:
+        COALESCED.inc()
+    return result
+
+
+def _compute_recommendations(snap: AISnapshot, child_id: str, limit: int) -> List[Dict[str, Any]]:
+    try:
+        results = _recommend(snap, child_id, limit)
     except Exception:
+        AI_EXCEPTIONS.inc(operation="recommend")
         logger.exception("AI recommendation failed for child_id=%s", child_id)
-        # last resort
-        return _fallback_recommendations(child_id, limit)
+        # last resort (not cached: the next call should retry the real path)
+        return _fallback_recommendations(snap, child_id, limit)
+
+    _cache_result(snap, child_id, limit, results)
+    return results
+
+
+def _cache_result(snap: AISnapshot, child_id: str, limit: int, results: List[Dict[str, Any]]) -> None:
+    # not if a merge has published since `snap` was pinned: it may already have
+    # invalidated this child, and the result from `snap` would come back under the same key
+    STATE.results.put(
+        (child_id, limit, snap.refresh_version),
+        results,
+        valid=lambda: STATE.snapshot.version == snap.version,
+    )
+
+
+async def generate_recommendations_batch(
+    child_ids: Sequence[str],
+    limit: int = 10,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    generate_recommendations for many children at once (same cache, one snapshot).
+    Cache hits are answered here; the misses are computed together like a single
+    cache miss: off the event loop, coalesced, and subject to INFERENCE_MAX_PENDING.
+    """
+    with RECOMMEND_STAGE_SECONDS.time(stage="batch_total"):
+        child_ids = list(dict.fromkeys(child_ids))  # dedupe, keep order
+        snap = STATE.snapshot
+        if not snap.version:
+            request_refresh()
+            return {cid: _fallback_recommendations(snap, cid, limit) for cid in child_ids}
+
+        results: Dict[str, List[Dict[str, Any]]] = {}
+        missing = []
+        for child_id in child_ids:
+            cached = STATE.results.get((child_id, limit, snap.refresh_version))
+            if cached is not None:
+                RECOMMENDATIONS.inc(source="cache")
+                results[child_id] = list(cached)
+            else:
+                missing.append(child_id)
+
+        if missing:
+            computed = await _run_inference(
+                ("batch", tuple(missing), limit, snap.version), _compute_batch, snap, missing, limit
+            )
+            for child_id in missing:
+                results[child_id] = list(computed[child_id])
+        return {cid: results[cid] for cid in child_ids}
+
+
+def _compute_batch(snap: AISnapshot, child_ids: List[str], limit: int) -> Dict[str, List[Dict[str, Any]]]:
+    try:
+        computed = _recommend_batch(snap, child_ids, limit)
+    except Exception:
+        AI_EXCEPTIONS.inc(operation="recommend_batch")
+        logger.exception("AI batch recommendation failed for %d children", len(child_ids))
+        return {cid: _fallback_recommendations(snap, cid, limit) for cid in child_ids}
+
+    for child_id in child_ids:
+        _cache_result(snap, child_id, limit, computed[child_id])
+    return computed
@@ -0,0 +1,208 @@
+# services/ai_store.py
+from __future__ import annotations
+
+import sys
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+# column name -> (source field, dtype, default, converter)
+ColumnSpec = Dict[str, Tuple[str, Any, Any, Callable[[Any], Any]]]
+
+
+def _float(v: Any) -> float:
+    return float(v)
+
+
+def _int(v: Any) -> int:
+    return int(v)
+
+
+def _interned(v: Any) -> Any:
+    # categories / genders repeat a lot: keep one string object per distinct value
+    return sys.intern(v) if isinstance(v, str) else v
+
+
+class ColumnStore:
+    """
+    Metadata as parallel NumPy arrays, one row per entity.
+
+    Rows [0, n_encoded) are the ALS encoder indices themselves (so a model item/user
+    id is directly a row); entities the encoder doesn't know are appended after them.
+    The encoder dict is shared with the model assets, not copied: UUIDs are interned
+    once. `present` is False for encoder rows the DB returned nothing for.
+    """
+
+    COLUMNS: ColumnSpec = {}
+
+    def __init__(self, encoder: Mapping[str, int], n_encoded: int, ids: np.ndarray,
+                 extra_index: Dict[str, int], present: np.ndarray, columns: Dict[str, np.ndarray]):
+        self.encoder = encoder
+        self.n_encoded = n_encoded
+        self.ids = ids
+        self.extra_index = extra_index
+        self.present = present
+        for name, values in columns.items():
+            setattr(self, name, values)
+
+    @classmethod
+    def build(cls, rows: Iterable[Dict[str, Any]], key: str, encoder: Mapping[str, int]):
+        n_encoded = (max(encoder.values()) + 1) if encoder else 0
+
+        ids: List[Any] = [None] * n_encoded
+        for uid, idx in encoder.items():
+            ids[idx] = uid
+
+        values: Dict[str, List[Any]] = {
+            name: [default] * n_encoded for name, (_, _, default, _) in cls.COLUMNS.items()
+        }
+        present = [False] * n_encoded
+        extra_index: Dict[str, int] = {}
+
+        for r in rows:
+            uid = r[key]
+            row = encoder.get(uid)
+            if row is None:
+                row = extra_index.get(uid)
+            if row is None:
+                row = len(ids)
+                extra_index[uid] = row
+                ids.append(sys.intern(uid))
+                present.append(False)
+                for name, (_, _, default, _) in cls.COLUMNS.items():
+                    values[name].append(default)
+
+            present[row] = True
+            for name, (source, _, default, convert) in cls.COLUMNS.items():
+                v = r.get(source)
+                values[name][row] = convert(v) if v is not None else default
+
+        columns = {
+            name: np.array(values[name], dtype=dtype)
+            for name, (_, dtype, _, _) in cls.COLUMNS.items()
+        }
+        return cls(
+            encoder=encoder,
+            n_encoded=n_encoded,
+            ids=np.array(ids, dtype=object),
+            extra_index=extra_index,
+            present=np.array(present, dtype=bool),
+            columns=columns,
+        )
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        The store as plain (non-object) arrays for np.savez; from_arrays reverses it.
+        Encoded ids aren't saved (they come back from the encoder), object columns
+        are saved as strings plus a "<name>__missing" mask for None.
+        """
+        arrays = {
+            "n_encoded": np.array(self.n_encoded, dtype=np.int64),
+            "extra_ids": np.array([str(v) for v in self.ids[self.n_encoded:]], dtype=str),
+            "present": self.present,
+        }
+        for name, (_, dtype, _, _) in self.COLUMNS.items():
+            values = getattr(self, name)
+            if dtype is object:
+                arrays[name] = np.array(["" if v is None else str(v) for v in values], dtype=str)
+                arrays[f"{name}__missing"] = np.array([v is None for v in values], dtype=bool)
+            else:
+                arrays[name] = values
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: Mapping[str, np.ndarray], encoder: Mapping[str, int]):
+        n_encoded = int(arrays["n_encoded"])
+        if n_encoded != ((max(encoder.values()) + 1) if encoder else 0):
+            raise ValueError("Stored rows don't match the encoder")
+
+        ids = np.empty(n_encoded + len(arrays["extra_ids"]), dtype=object)
+        if hasattr(encoder, "keys_array"):  # SortedEncoder: no per-key Python loop
+            ids[encoder.values_array] = encoder.keys_array.tolist()
+        else:
+            for uid, idx in encoder.items():
+                ids[idx] = uid
+        extra_ids = [sys.intern(uid) for uid in arrays["extra_ids"].tolist()]
+        ids[n_encoded:] = extra_ids
+
+        columns: Dict[str, np.ndarray] = {}
+        for name, (_, dtype, _, convert) in cls.COLUMNS.items():
+            if dtype is object:
+                missing = arrays[f"{name}__missing"]
+                columns[name] = np.array(
+                    [None if m else convert(v) for v, m in zip(arrays[name].tolist(), missing.tolist())],
+                    dtype=object,
+                )
+            else:
+                columns[name] = np.asarray(arrays[name], dtype=dtype)
+        return cls(
+            encoder=encoder,
+            n_encoded=n_encoded,
+            ids=ids,
+            extra_index={uid: n_encoded + i for i, uid in enumerate(extra_ids)},
+            present=np.asarray(arrays["present"], dtype=bool),
+            columns=columns,
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def count(self) -> int:
+        """Entities that have metadata."""
+        return int(self.present.sum())
+
+    def row_of(self, uid: str) -> Optional[int]:
+        row = self.encoder.get(uid)
+        if row is None:
+            row = self.extra_index.get(uid)
+        if row is None or not self.present[row]:
+            return None
+        return row
+
+    def rows_of(self, uids: Iterable[str]) -> np.ndarray:
+        rows = [self.row_of(uid) for uid in uids]
+        return np.array([r for r in rows if r is not None], dtype=np.int64)
+
+    def memory_report(self) -> Dict[str, int]:
+        """Approximate bytes per column (object columns include the distinct objects they point to)."""
+        report: Dict[str, int] = {}
+        for name in ("ids", "present", *self.COLUMNS):
+            arr = getattr(self, name)
+            size = arr.nbytes
+            if arr.dtype == object:
+                distinct = {id(v): v for v in arr if v is not None}
+                size += sum(sys.getsizeof(v) for v in distinct.values())
+            report[name] = int(size)
+        report["index"] = sys.getsizeof(self.encoder) + sys.getsizeof(self.extra_index)
+        report["total"] = sum(report.values())
+        return report
+
+
+class ActivityStore(ColumnStore):
+    COLUMNS: ColumnSpec = {
+        "name": ("activity_name", object, None, lambda v: v),
+        "category": ("category", object, None, _interned),
+        "price": ("price", np.float64, 0.0, _float),
+        "duration_hours": ("duration_hours", np.int32, 0, _int),
+        "min_age": ("min_age", np.float32, np.nan, _float),
+        "max_age": ("max_age", np.float32, np.nan, _float),
+        "lat": ("activity_lat", np.float64, 0.0, _float),
+        "lng": ("activity_lng", np.float64, 0.0, _float),
+    }
+
+
+class ChildStore(ColumnStore):
+    COLUMNS: ColumnSpec = {
+        "age": ("age", np.float32, np.nan, _float),
+        "gender": ("gender", object, None, _interned),
+        "lat": ("lat", np.float64, 0.0, _float),
+        "lng": ("lng", np.float64, 0.0, _float),
+    }
+
+    def location_and_age(self, child_id: str) -> Tuple[float, float, Optional[float]]:
+        row = self.row_of(child_id)
+        if row is None:
+            return 0.0, 0.0, None
+        age = self.age[row]
+        return float(self.lat[row]), float(self.lng[row]), None if np.isnan(age) else float(age)
@@ -0,0 +1,226 @@
+# services/ai_train.py
+"""
+Offline ALS retraining from the live tables.
+
+    python -m services.ai_train [--factors 64] [--iterations 15] [--threads 0] [--registry model_registry]
+
+Interactions are the rows refresh_ai_cache feeds the serving matrix (BOOKINGS_QUERY,
+confidence 1 + CONFIDENCE_ALPHA * rating), so training and serving agree on weights.
+Each run writes <registry>/<version>/ with the mmap artifacts (services.ai_artifacts),
+pickles for the legacy loader and a manifest carrying params, timings and holdout
+metrics, then points <registry>/LATEST at it.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import pickle
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from services.ai_artifacts import REGISTRY_DIR, export_artifacts, set_latest, version_dir
+from services.ai_quant import QUANT_MODES
+from services.ai_service import (
+    BOOKINGS_QUERY, CONFIDENCE_ALPHA, QUANTIZE, _confidence, fetch_columns, interaction_matrix
+)
+
+logger = logging.getLogger("saifi.ai.train")
+
+
+# =========================
+# Interactions
+# =========================
+def build_interactions(
+    bookings: Dict[str, Sequence[Any]],
+) -> Tuple[csr_matrix, Dict[str, int], Dict[str, int]]:
+    """
+    Child x activity confidence matrix + fresh encoders (sorted ids -> index) from
+    column-wise bookings. Rows without a rating are skipped and repeated pairs
+    summed, as in _build_cache.
+    """
+    ratings = np.array(bookings.get("rating", ()), dtype=np.float64)
+    rated = ~np.isnan(ratings)
+    if not rated.any():
+        raise ValueError("No rated bookings to train on")
+
+    child_ids = np.array(bookings["child_id"], dtype=str)[rated]
+    activity_ids = np.array(bookings["activity_id"], dtype=str)[rated]
+    children, user_idx = np.unique(child_ids, return_inverse=True)
+    activities, item_idx = np.unique(activity_ids, return_inverse=True)
+
+    matrix = interaction_matrix(
+        user_idx, item_idx, _confidence(ratings[rated]),
+        shape=(len(children), len(activities))
+    )
+
+    child_encoder = {str(cid): i for i, cid in enumerate(children)}
+    activity_encoder = {str(aid): i for i, aid in enumerate(activities)}
+    return matrix, child_encoder, activity_encoder
+
+
+# =========================
+# Training
+# =========================
+def _new_model(factors: int, iterations: int, regularization: float, threads: int, seed: int):
+    from implicit.cpu.als import AlternatingLeastSquares
+
+    # alpha stays 1.0: the confidence weighting is already in the matrix
+    return AlternatingLeastSquares(
+        factors=factors,
+        iterations=iterations,
+        regularization=regularization,
+        alpha=1.0,
+        num_threads=threads,
+        random_state=seed,
+    )
+
+
+def fit(model: Any, matrix: csr_matrix) -> Tuple[float, List[float]]:
+    """Fits in place; returns (total seconds, seconds per iteration)."""
+    iteration_seconds: List[float] = []
+
+    def on_iteration(iteration: int, elapsed: float, *_):
+        iteration_seconds.append(round(elapsed, 4))
+        logger.debug("ALS iteration %d: %.1f ms", iteration + 1, elapsed * 1000)
+
+    started = time.perf_counter()
+    model.fit(matrix, show_progress=False, callback=on_iteration)
+    return time.perf_counter() - started, iteration_seconds
+
+
+def evaluate(
+    matrix: csr_matrix,
+    params: Dict[str, Any],
+    holdout: float,
+    k: int,
+    seed: int,
+) -> Optional[Dict[str, Any]]:
+    """Ranking metrics@k of a model fitted on (1 - holdout) of the interactions."""
+    if holdout <= 0:
+        return None
+
+    from implicit.evaluation import ranking_metrics_at_k, train_test_split
+
+    train, test = train_test_split(matrix, train_percentage=1.0 - holdout, random_state=seed)
+    model = _new_model(seed=seed, **params)
+    fit(model, train)
+    metrics = ranking_metrics_at_k(model, train, test, K=k, show_progress=False)
+    return {
+        "k": k,
+        "holdout": holdout,
+        "test_interactions": int(test.nnz),
+        **{f"{name}@{k}": round(float(value), 5) for name, value in metrics.items()},
+    }
+
+
+def train(
+    bookings: Dict[str, Sequence[Any]],
+    factors: int = 64,
+    iterations: int = 15,
+    regularization: float = 0.1,
+    threads: int = 0,
+    holdout: float = 0.2,
+    k: int = 10,
+    seed: int = 42,
+) -> Tuple[Any, Dict[str, int], Dict[str, int], Dict[str, Any]]:
+    """Returns (model, child_encoder, activity_encoder, training report)."""
+    matrix, child_encoder, activity_encoder = build_interactions(bookings)
+    params = dict(factors=factors, iterations=iterations, regularization=regularization, threads=threads)
+
+    metrics = evaluate(matrix, params, holdout, k, seed)
+
+    model = _new_model(seed=seed, **params)
+    train_seconds, iteration_seconds = fit(model, matrix)
+
+    report = {
+        "interactions": int(matrix.nnz),
+        "params": {**params, "confidence_alpha": CONFIDENCE_ALPHA, "seed": seed},
+        "train_seconds": round(train_seconds, 3),
+        "iteration_seconds": iteration_seconds,
+        "metrics": metrics,
+    }
+    return model, child_encoder, activity_encoder, report
+
+
+# =========================
+# Registry output
+# =========================
+def write_version(
+    registry: str,
+    model: Any,
+    child_encoder: Dict[str, int],
+    activity_encoder: Dict[str, int],
+    report: Dict[str, Any],
+    version: Optional[str] = None,
+    quantize: Sequence[str] = (),
+) -> str:
+    """Writes <registry>/<version>/ and repoints LATEST to it; returns the directory."""
+    version = version or time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+    out_dir = version_dir(version, registry)
+
+    export_artifacts(
+        model, child_encoder, activity_encoder, out_dir,
+        extra_manifest={"version": version, "training": report},
+        quantize=quantize,
+    )
+    # pickles for SAIFI_MODEL_PATH-style loading
+    for name, obj in (("saifi_model.pkl", model),
+                      ("child_encoder.pkl", child_encoder),
+                      ("activity_encoder.pkl", activity_encoder)):
+        with open(os.path.join(out_dir, name), "wb") as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    set_latest(version, registry)
+    return out_dir
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m services.ai_train")
+    parser.add_argument("--registry", default=REGISTRY_DIR)
+    parser.add_argument("--version", default=None, help="defaults to a UTC timestamp")
+    parser.add_argument("--factors", type=int, default=64)
+    parser.add_argument("--iterations", type=int, default=15)
+    parser.add_argument("--regularization", type=float, default=0.1)
+    parser.add_argument("--threads", type=int, default=0, help="0 = all cores")
+    parser.add_argument("--holdout", type=float, default=0.2, help="fraction held out for metrics (0 skips)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--quantize", nargs="*", choices=QUANT_MODES,
+                        default=[QUANTIZE] if QUANTIZE else [],
+                        help="quantized item codes to export (default: SAIFI_AI_QUANTIZE)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+    started = time.perf_counter()
+    bookings = fetch_columns(BOOKINGS_QUERY)
+    fetch_seconds = time.perf_counter() - started
+
+    model, child_encoder, activity_encoder, report = train(
+        bookings,
+        factors=args.factors,
+        iterations=args.iterations,
+        regularization=args.regularization,
+        threads=args.threads,
+        holdout=args.holdout,
+        k=args.k,
+        seed=args.seed,
+    )
+    report["fetch_seconds"] = round(fetch_seconds, 3)
+
+    out_dir = write_version(args.registry, model, child_encoder, activity_encoder, report, args.version,
+                            quantize=args.quantize)
+    logger.info(
+        "Trained %d children x %d activities (%d interactions) in %.2fs -> %s",
+        len(child_encoder), len(activity_encoder), report["interactions"], report["train_seconds"], out_dir
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
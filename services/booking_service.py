@@ -1,5 +1,6 @@
-from db.connection import get_connection
+from db.connection import db_connection
 from psycopg2.extras import RealDictCursor
+from services.ai_service import record_booking
 
 
 class BookingService:
@@ -17,103 +18,105 @@ class BookingService:
         end_date=None,
         notes=None
     ):
-        conn = get_connection()
-        cur = conn.cursor()
+        with db_connection() as conn:
+            cur = conn.cursor()
 
-        try:
-            cur.execute("""
-                INSERT INTO bookings 
-                (parent_id, child_id, activity_id, provider_id, status, start_date, end_date, notes)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING booking_id;
-            """, (
-                str(parent_id),
-                str(child_id),
-                str(activity_id),
-                str(provider_id),
-                'pending',
-                start_date,
-                end_date,
-                notes
-            ))
-
-            booking_id = cur.fetchone()[0]
-            conn.commit()
-            return booking_id
-
-        except Exception as e:
-            conn.rollback()
-            raise e
-
-        finally:
-            cur.close()
-            conn.close()
+            try:
+                cur.execute("""
+                    INSERT INTO bookings 
+                    (parent_id, child_id, activity_id, provider_id, status, start_date, end_date, notes)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    RETURNING booking_id;
+                """, (
+                    str(parent_id),
+                    str(child_id),
+                    str(activity_id),
+                    str(provider_id),
+                    'pending',
+                    start_date,
+                    end_date,
+                    notes
+                ))
+
+                booking_id = cur.fetchone()[0]
+                conn.commit()
+                record_booking(child_id, activity_id)
+                return booking_id
+
+            except Exception as e:
+                conn.rollback()
+                raise e
+
+            finally:
+                cur.close()
 
     # =========================
     # ✅ Get Parent Bookings
     # =========================
     @staticmethod
     def get_parent_bookings(parent_id: str):
-        conn = get_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-
-        cur.execute("""
-            SELECT
-                b.booking_id,
-                b.parent_id,
-                b.child_id,
-                b.activity_id,
-                b.provider_id,
-                b.status,
-                b.start_date,
-                b.end_date,
-                b.notes,
-
-                c.first_name || ' ' || c.last_name AS child_name,
-                a.title AS activity_title,
-                a.price AS price,
-                a.type AS type
-
-            FROM bookings b
-            JOIN children c ON b.child_id = c.child_id
-            JOIN activities a ON b.activity_id = a.activity_id
-            WHERE b.parent_id = %s
-        """, (parent_id,))
-
-        rows = cur.fetchall()
-        cur.close()
-        conn.close()
-        return rows
+        with db_connection() as conn:
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+
+            cur.execute("""
+                SELECT
+                    b.booking_id,
+                    b.parent_id,
+                    b.child_id,
+                    b.activity_id,
+                    b.provider_id,
+                    b.status,
+                    b.start_date,
+                    b.end_date,
+                    b.notes,
+
+                    c.first_name || ' ' || c.last_name AS child_name,
+                    a.title AS activity_title,
+                    a.price AS price,
+                    a.type AS type
+
+                FROM bookings b
+                JOIN children c ON b.child_id = c.child_id
+                JOIN activities a ON b.activity_id = a.activity_id
+                WHERE b.parent_id = %s
+            """, (parent_id,))
+
+            rows = cur.fetchall()
+            cur.close()
+            return rows
 
     # =========================
     # ✅ Delete Booking (PARENT)
     # =========================
     @staticmethod
     def delete_booking(booking_id: str):
-        conn = get_connection()
-        cur = conn.cursor()
+        with db_connection() as conn:
+            cur = conn.cursor()
 
-        try:
-            cur.execute("""
-                DELETE FROM bookings
-                WHERE booking_id = %s;
-            """, (booking_id,))
+            try:
+                cur.execute("""
+                    DELETE FROM bookings
+                    WHERE booking_id = %s
+                    RETURNING child_id, activity_id, status;
+                """, (booking_id,))
 
-            affected = cur.rowcount
-            conn.commit()
+                deleted = cur.fetchone()
+                conn.commit()
 
-            if affected == 0:
-                raise Exception("Booking not found")
+                if deleted is None:
+                    raise Exception("Booking not found")
 
-            return True
+                if deleted[2] != "rejected":
+                    record_booking(deleted[0], deleted[1], removed=True)
 
-        except Exception as e:
-            conn.rollback()
-            raise e
+                return True
 
-        finally:
-            cur.close()
-            conn.close()
+            except Exception as e:
+                conn.rollback()
+                raise e
+
+            finally:
+                cur.close()
 
 
     # ================================
@@ -121,165 +124,165 @@ class BookingService:
     # ================================
     @staticmethod
     def get_bookings_by_provider(provider_id: str):
-        conn = get_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+        with db_connection() as conn:
+            cur = conn.cursor(cursor_factory=RealDictCursor)
 
-        cur.execute("""
-            SELECT
-                b.booking_id,
-                b.status,
+            cur.execute("""
+                SELECT
+                    b.booking_id,
+                    b.status,
 
-                a.title AS activity_title,
+                    a.title AS activity_title,
 
-                c.first_name || ' ' || c.last_name AS child_name,
-                c.gender AS child_gender,
+                    c.first_name || ' ' || c.last_name AS child_name,
+                    c.gender AS child_gender,
 
-                p.first_name || ' ' || p.last_name AS parent_name,
-                p.phone AS parent_phone
+                    p.first_name || ' ' || p.last_name AS parent_name,
+                    p.phone AS parent_phone
 
-            FROM bookings b
-            JOIN activities a ON b.activity_id = a.activity_id
-            JOIN children c ON b.child_id = c.child_id
-            JOIN parents p ON b.parent_id = p.parent_id
-            WHERE b.provider_id = %s
-        """, (provider_id,))
+                FROM bookings b
+                JOIN activities a ON b.activity_id = a.activity_id
+                JOIN children c ON b.child_id = c.child_id
+                JOIN parents p ON b.parent_id = p.parent_id
+                WHERE b.provider_id = %s
+            """, (provider_id,))
 
-        rows = cur.fetchall()
-        cur.close()
-        conn.close()
-        return rows
+            rows = cur.fetchall()
+            cur.close()
+            return rows
 
     # =========================
     # ✅ Get Child Bookings
     # =========================
     @staticmethod
     def get_child_bookings(child_id: str):
-        conn = get_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-
-        cur.execute("""
-            SELECT 
-                booking_id,
-                parent_id,
-                child_id,
-                activity_id,
-                provider_id,
-                status,
-                start_date,
-                end_date,
-                notes,
-            FROM bookings
-            WHERE child_id = %s
-        """, (child_id,))
-
-        rows = cur.fetchall()
-        cur.close()
-        conn.close()
-        return rows
+        with db_connection() as conn:
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+
+            cur.execute("""
+                SELECT 
+                    booking_id,
+                    parent_id,
+                    child_id,
+                    activity_id,
+                    provider_id,
+                    status,
+                    start_date,
+                    end_date,
+                    notes,
+                FROM bookings
+                WHERE child_id = %s
+            """, (child_id,))
+
+            rows = cur.fetchall()
+            cur.close()
+            return rows
 
     # =========================
     # ✅ Update Booking Status
     # =========================
     @staticmethod
     def update_booking_status(booking_id: str, status: str):
-        conn = get_connection()
-        cur = conn.cursor()
-
-        try:
-            cur.execute("""
-                SELECT activity_id
-                FROM bookings
-                WHERE booking_id = %s
-                AND status = 'pending';
-            """, (booking_id,))
-
-            row = cur.fetchone()
-            if not row:
-                conn.rollback()
-                return False
+        with db_connection() as conn:
+            cur = conn.cursor()
 
-            activity_id = row[0]
-
-            cur.execute("""
-                SELECT capacity
-                FROM activities
-                WHERE activity_id = %s
-                FOR UPDATE;
-            """, (activity_id,))
-
-            capacity_row = cur.fetchone()
-            if not capacity_row:
-                conn.rollback()
-                return False
-
-            capacity = capacity_row[0]
+            try:
+                cur.execute("""
+                    SELECT activity_id, child_id
+                    FROM bookings
+                    WHERE booking_id = %s
+                    AND status = 'pending';
+                """, (booking_id,))
 
-            if status == "approved":
-                if capacity <= 0:
+                row = cur.fetchone()
+                if not row:
                     conn.rollback()
-                    raise ValueError("No remaining capacity for this activity")
+                    return False
 
-                cur.execute("""
-                    UPDATE bookings
-                    SET status = 'approved'
-                    WHERE booking_id = %s;
-                """, (booking_id,))
+                activity_id, child_id = row
 
                 cur.execute("""
-                    UPDATE activities
-                    SET capacity = capacity - 1
-                    WHERE activity_id = %s;
+                    SELECT capacity
+                    FROM activities
+                    WHERE activity_id = %s
+                    FOR UPDATE;
                 """, (activity_id,))
 
-            elif status == "rejected":
-                cur.execute("""
-                    UPDATE bookings
-                    SET status = 'rejected'
-                    WHERE booking_id = %s;
-                """, (booking_id,))
+                capacity_row = cur.fetchone()
+                if not capacity_row:
+                    conn.rollback()
+                    return False
+
+                capacity = capacity_row[0]
+
+                if status == "approved":
+                    if capacity <= 0:
+                        conn.rollback()
+                        raise ValueError("No remaining capacity for this activity")
+
+                    cur.execute("""
+                        UPDATE bookings
+                        SET status = 'approved'
+                        WHERE booking_id = %s;
+                    """, (booking_id,))
+
+                    cur.execute("""
+                        UPDATE activities
+                        SET capacity = capacity - 1
+                        WHERE activity_id = %s;
+                    """, (activity_id,))
+
+                elif status == "rejected":
+                    cur.execute("""
+                        UPDATE bookings
+                        SET status = 'rejected'
+                        WHERE booking_id = %s;
+                    """, (booking_id,))
+
+                else:
+                    conn.rollback()
+                    raise ValueError("Invalid status value")
 
-            else:
-                conn.rollback()
-                raise ValueError("Invalid status value")
+                conn.commit()
 
-            conn.commit()
-            return True
+                if status == "rejected":
+                    record_booking(child_id, activity_id, removed=True)
 
-        except Exception as e:
-            conn.rollback()
-            raise e
+                return True
 
-        finally:
-            cur.close()
-            conn.close()
+            except Exception as e:
+                conn.rollback()
+                raise e
+
+            finally:
+                cur.close()
 
     # =========================
     # ✅ Get Bookings By Activity (FOR PROVIDER)
     # =========================
     @staticmethod
     def get_bookings_by_activity(activity_id: str):
-        conn = get_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-
-        cur.execute("""
-            SELECT
-                b.booking_id,
-                b.status,
-
-                c.first_name || ' ' || c.last_name AS child_name,
-                c.gender AS child_gender,
-                c.age AS child_age,
-
-                p.first_name || ' ' || p.last_name AS parent_name,
-                p.phone AS parent_phone
-
-            FROM bookings b
-            JOIN children c ON b.child_id = c.child_id
-            JOIN parents p ON b.parent_id = p.parent_id
-            WHERE b.activity_id = %s
-        """, (activity_id,))
-
-        rows = cur.fetchall()
-        cur.close()
-        conn.close()
-        return rows
+        with db_connection() as conn:
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+
+            cur.execute("""
+                SELECT
+                    b.booking_id,
+                    b.status,
+
+                    c.first_name || ' ' || c.last_name AS child_name,
+                    c.gender AS child_gender,
+                    c.age AS child_age,
+
+                    p.first_name || ' ' || p.last_name AS parent_name,
+                    p.phone AS parent_phone
+
+                FROM bookings b
+                JOIN children c ON b.child_id = c.child_id
+                JOIN parents p ON b.parent_id = p.parent_id
+                WHERE b.activity_id = %s
+            """, (activity_id,))
+
+            rows = cur.fetchall()
+            cur.close()
+            return rows
@@ -1,5 +1,5 @@
 import uuid
-from db.connection import get_connection
+from db.connection import db_connection
 from psycopg2.extras import RealDictCursor
 
 
@@ -10,70 +10,67 @@ class ChildService:
     # =========================
     @staticmethod
     def get_all_children():
-        conn = get_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+        with db_connection() as conn:
+            cur = conn.cursor(cursor_factory=RealDictCursor)
 
-        cur.execute("""
-            SELECT *
-            FROM children
-            ORDER BY created_at DESC
-        """)
+            cur.execute("""
+                SELECT *
+                FROM children
+                ORDER BY created_at DESC
+            """)
 
-        rows = cur.fetchall()
-        cur.close()
-        conn.close()
+            rows = cur.fetchall()
+            cur.close()
 
-        return rows
+            return rows
     # =========================
     # ✅ delete_child
     # =========================
     @staticmethod
     def delete_child(child_id: str):
-        conn = get_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+        with db_connection() as conn:
+            cur = conn.cursor(cursor_factory=RealDictCursor)
 
-        cur.execute(
-            "DELETE FROM children WHERE child_id = %s RETURNING child_id",
-            (child_id,)
-        )
+            cur.execute(
+                "DELETE FROM children WHERE child_id = %s RETURNING child_id",
+                (child_id,)
+            )
 
-        deleted = cur.fetchone()
-        conn.commit()
+            deleted = cur.fetchone()
+            conn.commit()
 
-        cur.close()
-        conn.close()
+            cur.close()
 
-        return deleted
+            return deleted
     # =========================
     # ✅ Get Children By Parent
     # =========================
     @staticmethod
     def get_children_by_parent(parent_id: str):
-        conn = get_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+        with db_connection() as conn:
+            cur = conn.cursor(cursor_factory=RealDictCursor)
 
-        cur.execute("""
-            SELECT 
-                child_id,
-                parent_id,
-                first_name,
-                last_name,
-                birthdate,
-                gender,
-                interests,
-                notes,
-                created_at
-            FROM children
-            WHERE parent_id = %s
-            ORDER BY created_at DESC
-        """, (parent_id,))
+            cur.execute("""
+                SELECT 
+                    child_id,
+                    parent_id,
+                    first_name,
+                    last_name,
+                    birthdate,
+                    gender,
+                    interests,
+                    notes,
+                    created_at
+                FROM children
+                WHERE parent_id = %s
+                ORDER BY created_at DESC
+            """, (parent_id,))
 
-        rows = cur.fetchall()
+            rows = cur.fetchall()
 
-        cur.close()
-        conn.close()
+            cur.close()
 
-        return rows
+            return rows
 
 
     # =========================
@@ -81,69 +78,68 @@ class ChildService:
     # =========================
     @staticmethod
     def create_child(data: dict):
-        conn = get_connection()
-        cur = conn.cursor()
-
-        child_id = str(uuid.uuid4())
-        interests = data.get("interests") or []
-        notes = data.get("notes")
-
-        try:
-            # ✅ 1. Check if child already exists
-            cur.execute("""
-                SELECT 1
-                FROM children
-                WHERE 
-                    parent_id = %s
-                AND first_name = %s
-                AND last_name = %s
-                AND birthdate = %s
-                AND gender = %s
-            """, (
-                data["parent_id"],
-                data["first_name"],
-                data["last_name"],
-                data["birthdate"],
-                data["gender"]
-            ))
-
-            if cur.fetchone():
-                raise Exception("Child already exists with same name, birthdate, and gender")
-
-            # ✅ 2. Insert if not duplicate
-            cur.execute("""
-                INSERT INTO children (
+        with db_connection() as conn:
+            cur = conn.cursor()
+
+            child_id = str(uuid.uuid4())
+            interests = data.get("interests") or []
+            notes = data.get("notes")
+
+            try:
+                # ✅ 1. Check if child already exists
+                cur.execute("""
+                    SELECT 1
+                    FROM children
+                    WHERE 
+                        parent_id = %s
+                    AND first_name = %s
+                    AND last_name = %s
+                    AND birthdate = %s
+                    AND gender = %s
+                """, (
+                    data["parent_id"],
+                    data["first_name"],
+                    data["last_name"],
+                    data["birthdate"],
+                    data["gender"]
+                ))
+
+                if cur.fetchone():
+                    raise Exception("Child already exists with same name, birthdate, and gender")
+
+                # ✅ 2. Insert if not duplicate
+                cur.execute("""
+                    INSERT INTO children (
+                        child_id,
+                        parent_id,
+                        first_name,
+                        last_name,
+                        birthdate,
+                        gender,
+                        interests,
+                        notes
+                    )
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                """, (
                     child_id,
-                    parent_id,
-                    first_name,
-                    last_name,
-                    birthdate,
-                    gender,
+                    data["parent_id"],
+                    data["first_name"],
+                    data["last_name"],
+                    data["birthdate"],
+                    data["gender"],
                     interests,
                     notes
-                )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                child_id,
-                data["parent_id"],
-                data["first_name"],
-                data["last_name"],
-                data["birthdate"],
-                data["gender"],
-                interests,
-                notes
-            ))
+                ))
 
-            conn.commit()
-            return child_id
+                conn.commit()
+                return child_id
 
-        except Exception as e:
-            conn.rollback()
-            raise e
+            except Exception as e:
+                conn.rollback()
+                raise e
 
-        finally:
-            cur.close()
-            conn.close()
+            finally:
+                cur.close()
 
     # =========================
     # ✅ Get Child With Parent Location (For AI Cold Start)
@@ -151,27 +147,26 @@ class ChildService:
 
     @staticmethod
     def get_child_with_parent_location(child_id: str):
-        conn = get_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+        with db_connection() as conn:
+            cur = conn.cursor(cursor_factory=RealDictCursor)
 
-        try:
-            cur.execute("""
-                SELECT 
-                    c.child_id,
-                    c.birthdate,
-                    c.gender,
-                    p.location_lat AS parent_lat,
-                    p.location_lng AS parent_lng
-                FROM children c
-                JOIN parents p ON c.parent_id = p.parent_id
-                WHERE c.child_id = %s;
-            """, (child_id,))
-
-            return cur.fetchone()
-
-        finally:
-            cur.close()
-            conn.close()
+            try:
+                cur.execute("""
+                    SELECT 
+                        c.child_id,
+                        c.birthdate,
+                        c.gender,
+                        p.location_lat AS parent_lat,
+                        p.location_lng AS parent_lng
+                    FROM children c
+                    JOIN parents p ON c.parent_id = p.parent_id
+                    WHERE c.child_id = %s;
+                """, (child_id,))
+
+                return cur.fetchone()
+
+            finally:
+                cur.close()
 
 
     # =========================
@@ -182,34 +177,33 @@ class ChildService:
         if not data:
             return False  # ✅ يمنع تنفيذ UPDATE فاضي
 
-        conn = get_connection()
-        cur = conn.cursor()
+        with db_connection() as conn:
+            cur = conn.cursor()
 
-        fields = []
-        values = []
+            fields = []
+            values = []
 
-        for key, value in data.items():
-            fields.append(f"{key} = %s")
-            values.append(value)
+            for key, value in data.items():
+                fields.append(f"{key} = %s")
+                values.append(value)
 
-        values.append(child_id)
+            values.append(child_id)
 
-        try:
-            cur.execute(f"""
-                UPDATE children
-                SET {', '.join(fields)}
-                WHERE child_id = %s
-            """, tuple(values))
+            try:
+                cur.execute(f"""
+                    UPDATE children
+                    SET {', '.join(fields)}
+                    WHERE child_id = %s
+                """, tuple(values))
 
-            updated = cur.rowcount > 0
-            conn.commit()
+                updated = cur.rowcount > 0
+                conn.commit()
 
-            return updated
+                return updated
 
-        except Exception as e:
-            conn.rollback()
-            raise e
+            except Exception as e:
+                conn.rollback()
+                raise e
 
-        finally:
-            cur.close()
-            conn.close()
+            finally:
+                cur.close()
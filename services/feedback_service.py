@@ -1,4 +1,5 @@
-from db.connection import get_connection
+from db.connection import db_connection
+from services.ai_service import record_feedback
 from uuid import uuid4
 
 
@@ -6,37 +7,38 @@ class FeedbackService:
 
     @staticmethod
     def create_feedback(data: dict):
-        conn = get_connection()
-        cursor = conn.cursor()
-
-        feedback_id = str(uuid4())
-
-        cursor.execute(
-            """
-            INSERT INTO feedback (
-                feedback_id,
-                parent_id,
-                child_id,
-                provider_id,
-                activity_id,
-                rating,
-                comment
-            )
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """,
-            (
-                feedback_id,
-                str(data["parent_id"]),
-                str(data["child_id"]),
-                str(data["provider_id"]),
-                str(data["activity_id"]),
-                data["rating"],
-                data.get("comment"),
+        with db_connection() as conn:
+            cursor = conn.cursor()
+
+            feedback_id = str(uuid4())
+
+            cursor.execute(
+                """
+                INSERT INTO feedback (
+                    feedback_id,
+                    parent_id,
+                    child_id,
+                    provider_id,
+                    activity_id,
+                    rating,
+                    comment
+                )
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                """,
+                (
+                    feedback_id,
+                    str(data["parent_id"]),
+                    str(data["child_id"]),
+                    str(data["provider_id"]),
+                    str(data["activity_id"]),
+                    data["rating"],
+                    data.get("comment"),
+                )
             )
-        )
 
-        conn.commit()
-        cursor.close()
-        conn.close()
+            conn.commit()
+            cursor.close()
+
+            record_feedback(data["child_id"], data["activity_id"], data["rating"])
 
-        return feedback_id
+            return feedback_id
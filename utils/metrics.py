@@ -0,0 +1,166 @@
+# utils/metrics.py
+"""
+Minimal in-process metrics with Prometheus text exposition (no client library).
+
+    REQUESTS = counter("saifi_requests_total", "Requests served", ["route"])
+    REQUESTS.inc(route="/ai/recommend")
+
+    LATENCY = summary("saifi_stage_seconds", "Stage latency", ["stage"])
+    with LATENCY.time(stage="candidates"):
+        ...
+
+Summaries keep the last `window` observations per label set and report
+p50/p95/p99 over them at scrape time, plus lifetime _sum/_count. Everything is
+per process: with several uvicorn workers each scrape sees one worker.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+QUANTILES = (0.5, 0.95, 0.99)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {value:g}" for key, value in sorted(values)]
+
+
+class Summary(_Metric):
+    kind = "summary"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), window: int = 2048):
+        super().__init__(name, help_text, labelnames)
+        self.window = window
+        self._recent: Dict[LabelValues, deque] = {}
+        self._totals: Dict[LabelValues, Tuple[float, int]] = {}  # lifetime (sum, count)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            recent = self._recent.get(key)
+            if recent is None:
+                recent = self._recent[key] = deque(maxlen=self.window)
+            recent.append(value)
+            s, c = self._totals.get(key, (0.0, 0))
+            self._totals[key] = (s + value, c + 1)
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observes the block's wall time in seconds (also when it raises)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def quantiles(self, **labels: str) -> Dict[float, float]:
+        with self._lock:
+            recent = list(self._recent.get(self._key(labels), ()))
+        if not recent:
+            return {}
+        return dict(zip(QUANTILES, np.quantile(recent, QUANTILES).tolist()))
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            snapshot = [(key, list(recent), self._totals[key]) for key, recent in self._recent.items()]
+
+        lines: List[str] = []
+        for key, recent, (total, count) in sorted(snapshot, key=lambda item: item[0]):
+            for q, value in zip(QUANTILES, np.quantile(recent, QUANTILES).tolist()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key, ('quantile', str(q)))} {value:.6g}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total:.6g}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} already registered differently")
+                return existing  # module reloads get the same series
+            self._metrics[metric.name] = metric
+            return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help_text, labelnames))
+
+
+def summary(name: str, help_text: str, labelnames: Sequence[str] = (), window: int = 2048) -> Summary:
+    return REGISTRY.register(Summary(name, help_text, labelnames, window))
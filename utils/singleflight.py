@@ -0,0 +1,60 @@
+# utils/singleflight.py
+"""
+Request coalescing for asyncio: concurrent callers asking for the same key share
+one in-flight computation instead of each starting their own.
+
+    flight = SingleFlight()
+    result, shared = await flight.do(key, lambda: compute(...))
+
+Only calls that overlap in time are merged; once the computation finishes the
+key is free again (caching the result is the caller's business).
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    The computation runs as its own task, so a caller that goes away (client
+    disconnect -> cancellation) doesn't cancel it for the others still waiting.
+    Exceptions reach every waiter. Not thread-safe: use from one event loop.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+        # ====== Stats ======
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """(result, shared): shared is True when this call joined another's computation."""
+        self.calls += 1
+        task = self._inflight.get(key)
+        shared = task is not None
+        if shared:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+        return await asyncio.shield(task), shared
+
+    def _finished(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved: no "never retrieved" warning if every waiter left
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._inflight), "calls": self.calls, "coalesced": self.coalesced}
@@ -0,0 +1,114 @@
+# utils/thread_budget.py
+"""
+Per-worker BLAS/OpenMP thread budgets.
+
+NumPy's BLAS and implicit default to one thread per core, in every uvicorn
+worker; N workers scoring at once then run N x cores threads and tail latency
+suffers. Two budgets, both per worker process:
+
+    request  applied at startup (main.py) and kept while serving; small, because
+             request-time scoring is many tiny matmuls running concurrently
+    batch    raised around heavy refresh jobs (top-K precompute, item neighbors)
+             via `batch_threads()`, then dropped back to the request budget
+
+BLAS thread pools are process-wide, so while a batch job runs, request scoring
+in the same worker may use the batch budget too. OpenMP limits only reach the
+calling thread; implicit's OpenMP loops take their count from model.num_threads
+instead (limit_model_threads / with_threads).
+
+    SAIFI_THREADS_REQUEST   default 1
+    SAIFI_THREADS_BATCH     default cores // SAIFI_WORKERS (or WEB_CONCURRENCY), at least 1
+"""
+from __future__ import annotations
+
+import copy
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+from threadpoolctl import threadpool_info, threadpool_limits
+
+T = TypeVar("T")
+
+CPUS = os.cpu_count() or 1
+WORKERS = max(1, int(os.getenv("SAIFI_WORKERS", os.getenv("WEB_CONCURRENCY", "1"))))
+REQUEST_THREADS = max(1, int(os.getenv("SAIFI_THREADS_REQUEST", "1")))
+BATCH_THREADS = max(1, int(os.getenv("SAIFI_THREADS_BATCH", str(max(1, CPUS // WORKERS)))))
+
+_lock = threading.Lock()
+_batch_jobs = 0
+_batch_limiter = None  # threadpool_limits of the outermost batch block, restores the previous limits
+_applied = False
+
+
+def apply_request_budget() -> None:
+    """Caps BLAS/OpenMP pools at the request budget. Call once at startup."""
+    global _applied
+    with _lock:
+        threadpool_limits(limits=REQUEST_THREADS)
+        _applied = True
+
+
+def limit_model_threads(model: Any) -> None:
+    """implicit models keep their own thread count (0 = all cores) for recommend()."""
+    if hasattr(model, "num_threads"):
+        model.num_threads = REQUEST_THREADS
+
+
+def with_threads(model: Any, threads: int) -> Any:
+    """Shallow copy of an implicit model with its own thread count (factors are shared)."""
+    if not hasattr(model, "num_threads"):
+        return model
+    model = copy.copy(model)
+    model.num_threads = threads
+    return model
+
+
+@contextmanager
+def batch_threads() -> Iterator[None]:
+    """
+    Raises the pools to the batch budget for the block. Overlapping blocks (from
+    different threads) share it; the last one out restores the request budget.
+    """
+    global _batch_jobs, _batch_limiter
+    with _lock:
+        _batch_jobs += 1
+        if _batch_jobs == 1:
+            _batch_limiter = threadpool_limits(limits=BATCH_THREADS)
+    try:
+        yield
+    finally:
+        with _lock:
+            _batch_jobs -= 1
+            if _batch_jobs == 0:
+                _batch_limiter.restore_original_limits()
+                _batch_limiter = None
+
+
+def run_batch(fn: Callable[..., T], *args: Any) -> T:
+    """fn(*args) under the batch budget (for run_in_executor)."""
+    with batch_threads():
+        return fn(*args)
+
+
+def report() -> Dict[str, Any]:
+    libraries: List[Dict[str, Optional[Any]]] = [
+        {
+            "user_api": lib.get("user_api"),
+            "internal_api": lib.get("internal_api"),
+            "num_threads": lib.get("num_threads"),
+            "version": lib.get("version"),
+        }
+        for lib in threadpool_info()
+    ]
+    with _lock:
+        return {
+            "cpus": CPUS,
+            "workers": WORKERS,
+            "request_threads": REQUEST_THREADS,
+            "batch_threads": BATCH_THREADS,
+            "applied": _applied,
+            "batch_jobs_running": _batch_jobs,
+            "libraries": libraries,
+        }